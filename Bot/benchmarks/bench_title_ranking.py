@@ -0,0 +1,101 @@
+"""
+标题排序基准测试
+生成10万条随机标题，测量searchByTitle实际使用的RankerCache路径的查询延迟（p50/p99）：
+cached是索引没变时的查询，rebuild是每次查询前索引都变化、需要重建TitleRanker的最坏情况，
+baseline是旧的双重循环排序
+
+    python benchmarks/bench_title_ranking.py --titles 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzywuzzy import fuzz
+from functionality.ranking import RankerCache
+
+WORDS = [
+    "python", "asyncio", "guide", "rust", "ownership", "intro", "sql", "index", "notion", "discord",
+    "bot", "cache", "latency", "queue", "webhook", "search", "fuzzy", "ranking", "heap", "database",
+    "design", "pattern", "testing", "deploy", "docker", "linux", "kernel", "network", "http", "api",
+    "token", "bucket", "stream", "parser", "compiler", "memory", "thread", "lock", "graph", "tree",
+]
+
+
+def make_corpus(count, seed):
+    rng = random.Random(seed)
+    titles = {}
+    while len(titles) < count:
+        words = rng.sample(WORDS, rng.randint(2, 7))
+        words.append(f"{rng.choice(WORDS)}-{len(titles)}")
+        title = " ".join(words).title()
+        titles[title] = title
+    return titles
+
+
+def make_queries(count, seed):
+    rng = random.Random(seed + 1)
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(count)]
+
+
+def baseline(search, titles):
+    """searchByTitle原来的排序方式"""
+    weights = {}
+    for title in titles:
+        title_list = title.lower().split(" ")
+        search_list = search.lower().split(" ")
+        for word in search_list:
+            if word in title_list:
+                if titles[title] not in weights:
+                    weights[titles[title]] = fuzz.partial_ratio(search.lower(), title.lower().replace("-", " ").replace("/", " "))
+                else:
+                    break
+    return sorted(weights, key=weights.get, reverse=True)
+
+
+def measure(name, queries, run):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<12} p50 {statistics.median(timings):9.2f} ms   p99 {p99:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline-queries", type=int, default=10,
+                        help="旧实现很慢，只跑前这么多个查询")
+    parser.add_argument("--rebuild-queries", type=int, default=20,
+                        help="每次都重建索引的查询数")
+    args = parser.parse_args()
+
+    titles = make_corpus(args.titles, args.seed)
+    queries = make_queries(args.queries, args.seed)
+
+    cache = RankerCache()
+    start = time.perf_counter()
+    ranker = cache.get("bench", 0, titles.items)
+    print(f"索引 {len(ranker)} 条标题用时 {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # 和search.getRanker相同：每次查询都经过缓存，版本没变时直接复用
+    measure("cached", queries, lambda query: cache.get("bench", 0, titles.items).top_k(query))
+
+    versions = iter(range(1, args.rebuild_queries + 1))
+    measure("rebuild", queries[:args.rebuild_queries],
+            lambda query: cache.get("bench", next(versions), titles.items).top_k(query))
+    if args.baseline_queries:
+        measure("baseline", queries[:args.baseline_queries], lambda query: baseline(query, titles)[:25])
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,14 @@ from functionality import setupBot, utils
 import os
 from database import SessionLocal, engine
 import models
+import migrate
 import json
 import functionality.utils as utils
 import functionality.security as security
 
 # database setup
 db = SessionLocal()
-models.Base.metadata.create_all(bind=engine)
+migrate.run_migrations(engine)
 
 # prefix data
 prefix = ""
@@ -61,6 +62,11 @@ async def setup(ctx):
         # 更新prefix_data
         prefix_data[str(monitor.guild_id)] = monitor.prefix
 
+        # API密钥可能已变更，清除监控配置缓存
+        notion_monitor = bot.get_cog("NotionMonitor")
+        if notion_monitor:
+            notion_monitor.monitors.invalidate(monitor.id)
+
         embed = discord.Embed(
             description="已连接Notion数据库。",
             color=discord.Color.green(),
@@ -3,6 +3,9 @@ import discord
 from discord.ext import commands
 from functionality.utils import *
 from functionality.addRecord import *
+from functionality import url_index
+from functionality import title_fetcher
+from functionality import bulk_ingest
 import asyncio
 
 try:
@@ -15,6 +18,11 @@ class Add(commands.Cog):
     def __init__(self, client):
         self.bot = client
         self.guild_data = self.bot.guild_info
+        # load the duplicate check index of every registered database
+        url_index.warm(guild.notion_db_id for guild in self.guild_data.values())
+
+    def cog_unload(self):
+        self.bot.loop.create_task(title_fetcher.close())
 
     @commands.command(name="add", aliases=["a"])
     async def add(self, ctx, *args):
@@ -53,12 +61,12 @@ class Add(commands.Cog):
         with ctx.channel.typing():
             if checkURL(url):
                 # get title
-                title = getTitle(url)
+                title = await getTitle(url)
                 # check if title is valid
                 if title:
                     # valid title received
                     # check if record already exists
-                    if doesItExist(url, client.notion_api_key, client.notion_db_id):
+                    if await doesItExist(url, client.notion_api_key, client.notion_db_id):
                         print("here")
                         # record already exists
                         # embed send
@@ -72,7 +80,7 @@ class Add(commands.Cog):
                     # check if user has tag and contributor role
                 else:
                     # title not able to extract
-                    if doesItExist(url, client.notion_api_key, client.notion_db_id):
+                    if await doesItExist(url, client.notion_api_key, client.notion_db_id):
                         # record already exists
                         # embed send
                         embed = discord.Embed(
@@ -111,7 +119,7 @@ class Add(commands.Cog):
                         # addData
                         tags = getTags(args)
                         author = "@" + str(ctx.author).split("#")[0]
-                        addAllData(
+                        page = await addAllData(
                             url,
                             client.notion_api_key,
                             client.notion_db_id,
@@ -122,13 +130,16 @@ class Add(commands.Cog):
                     else:
                         # addData
                         author = "@" + str(ctx.author).split("#")[0]
-                        addDataWithoutTag(
+                        page = await addDataWithoutTag(
                             url,
                             client.notion_api_key,
                             client.notion_db_id,
                             title,
                             author,
                         )
+                    if page and page.get("object") == "page":
+                        # keep the duplicate check in sync without waiting for a refresh
+                        url_index.add(client.notion_db_id, url, page.get("id"))
                     # send success message
                     # embed
                     embed = discord.Embed(
@@ -156,5 +167,109 @@ class Add(commands.Cog):
                 await ctx.send(embed=embed)
 
 
+    @commands.command(name="bulk_add", aliases=["ba"])
+    async def bulk_add(self, ctx, *args):
+        if not checkIfGuildPresent(ctx.guild.id):
+            embed = discord.Embed(
+                description="You are not registered, please run `"
+                + PREFIX
+                + "setup` first",
+                title="",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+        client = self.guild_data[str(ctx.guild.id)]
+
+        # links come from the arguments and/or an attached .txt/.csv file,
+        # the remaining arguments are tags applied to every link
+        links = [(arg, None) for arg in args if checkURL(arg)]
+        tag_args = [arg for arg in args if not checkURL(arg)]
+        for attachment in ctx.message.attachments:
+            if not attachment.filename.lower().endswith((".txt", ".csv")):
+                continue
+            if attachment.size > bulk_ingest.MAX_FILE_BYTES:
+                await ctx.send(f"{attachment.filename} is too large, the limit is 1MB")
+                return
+            content = await attachment.read()
+            links.extend(bulk_ingest.parse_links(content.decode("utf-8", errors="replace")))
+
+        if not links:
+            embed = discord.Embed(
+                title="No links found",
+                description="Usage: `"
+                + client.prefix
+                + "bulk_add <url> <url> ... [tags]` or attach a .txt/.csv file",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+        if len(links) > bulk_ingest.MAX_LINKS:
+            await ctx.send(f"Only the first {bulk_ingest.MAX_LINKS} links will be added")
+
+        progress = await ctx.send(embed=self.bulk_progress_embed(None, len(links)))
+        state = {"result": None, "finished": False}
+
+        async def update_progress():
+            # edit the progress message at most every 2 seconds
+            while not state["finished"]:
+                await asyncio.sleep(2)
+                if state["result"] is not None and not state["finished"]:
+                    try:
+                        await progress.edit(embed=self.bulk_progress_embed(state["result"]))
+                    except discord.HTTPException:
+                        pass
+
+        def on_progress(result):
+            state["result"] = result
+
+        updater = self.bot.loop.create_task(update_progress())
+        author = "@" + str(ctx.author).split("#")[0]
+        try:
+            result = await bulk_ingest.ingest(
+                links,
+                client.notion_api_key,
+                client.notion_db_id,
+                author,
+                tags=getTags([None] + tag_args) if client.tag else None,
+                on_progress=on_progress,
+            )
+        finally:
+            state["finished"] = True
+            updater.cancel()
+        await progress.edit(embed=self.bulk_summary_embed(result))
+
+    def bulk_progress_embed(self, result, total=None):
+        if result is None:
+            description = "Checking {} links...".format(total)
+        else:
+            description = "{}/{} processed - {} added, {} duplicates, {} failed".format(
+                result.done, result.total, len(result.added), len(result.duplicates), len(result.failed)
+            )
+        return discord.Embed(title="Adding links", description=description, color=discord.Color.blue())
+
+    def bulk_summary_embed(self, result):
+        embed = discord.Embed(
+            title="Bulk add finished",
+            description="{} added, {} duplicates, {} invalid, {} failed in {:.0f}s".format(
+                len(result.added), len(result.duplicates), len(result.invalid), len(result.failed), result.elapsed
+            ),
+            color=discord.Color.green() if not result.failed else discord.Color.orange(),
+        )
+        if result.failed:
+            embed.add_field(
+                name="Failed",
+                value="\n".join("{} ({})".format(url, error)[:200] for url, error in result.failed[:10])[:1024],
+                inline=False,
+            )
+        if result.invalid:
+            embed.add_field(
+                name="Invalid",
+                value="\n".join(url[:200] for url in result.invalid[:10])[:1024],
+                inline=False,
+            )
+        return embed
+
+
 def setup(client):
     client.add_cog(Add(client))
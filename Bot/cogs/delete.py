@@ -5,6 +5,7 @@ from functionality.utils import *
 from functionality.search import *
 import asyncio
 from functionality.deleteRecord import *
+from functionality import url_index
 
 try:
     PREFIX = os.environ["PREFIX"]
@@ -13,7 +14,7 @@ except:
 
 # bot delete by title function
 async def delByTitle(ctx, query, client, bot):
-    search_results = searchByTitle(
+    search_results = await searchByTitle(
         query.strip(), client.notion_db_id, client.notion_api_key
     )
 
@@ -68,14 +69,15 @@ async def delByTitle(ctx, query, client, bot):
 
         # check if contribuor turned on
         if client.tag:
-            deleteAll(search_results[option_to_delete - 1], client.notion_api_key)
+            await deleteAll(search_results[option_to_delete - 1], client.notion_api_key)
             # await ctx.send("Deleted all")
             # await ctx.send("Deleted with tag")
         else:
             # disabled contributor
-            deleteWithoutTag(
+            await deleteWithoutTag(
                 search_results[option_to_delete - 1], client.notion_api_key
             )
+        url_index.remove(client.notion_db_id, search_results[option_to_delete - 1].url)
             # await ctx.send("Deleted without tag and contributor")
 
         embed = discord.Embed(
@@ -96,7 +98,7 @@ async def delByTitle(ctx, query, client, bot):
 async def delByTag(ctx, query, client, bot, args):
     # TODO: Raghav Sharma...after searchTag func made use that function to delete stuff by tag
 
-    search_results = searchTag(
+    search_results = await searchTag(
         notion_db_id=client.notion_db_id,
         notion_api_key=client.notion_api_key,
         tags=getSearchTagsPayload(args),
@@ -151,7 +153,8 @@ async def delByTag(ctx, query, client, bot, args):
         title = search_results[option_to_delete - 1].title
 
         # since tags are enabled delete with or without contributor
-        deleteAll(search_results[option_to_delete - 1], client.notion_api_key)
+        await deleteAll(search_results[option_to_delete - 1], client.notion_api_key)
+        url_index.remove(client.notion_db_id, search_results[option_to_delete - 1].url)
         embed = discord.Embed(
             title="Successful! Record deleted",
             description=f"{title} deleted!",
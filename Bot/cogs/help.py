@@ -40,10 +40,16 @@ class Help(commands.Cog):
             f"```{prefix}monitor_stop (或 mstop)```": "停止当前频道的监控",
             f"```{prefix}notion_monitor (或 nm)```": "立即执行一次更新检查",
             f"```{prefix}monitor_config (或 mc)```": "查看当前监控配置",
+            f"```{prefix}monitor_status (或 mss)```": "查看监控调度状态和延迟",
+            f"```{prefix}snapshot_stats (或 sst)```": "查看快照存储大小",
             f"```{prefix}map_users (或 mu)```": "映射Notion用户ID到Discord用户",
             f"```{prefix}mc interval <分钟>```": "设置检查间隔时间",
             f"```{prefix}mc task_name <列名>```": "设置通知标题来源",
-            f"```{prefix}mc task_name default```": "恢复默认通知标题"
+            f"```{prefix}mc task_name default```": "恢复默认通知标题",
+            f"```{prefix}mc batch on|off```": "开启或关闭多条通知合并发送",
+            f"```{prefix}mc delivery bot|webhook```": "设置通知发送方式，Webhook不占用机器人的发送额度",
+            f"```{prefix}mc webhook_name <名称>```": "设置Webhook通知显示的名称",
+            f"```{prefix}mc webhook_avatar <地址>```": "设置Webhook通知显示的头像"
         }
 
         embed = discord.Embed(
@@ -6,18 +6,57 @@ from database import SessionLocal
 import models
 import functionality.utils as utils
 from functionality.security import getKey
-import requests
+from functionality import notion_http
+from functionality.scheduler import MonitorScheduler
+from functionality import snapshot_store
+from functionality.cache import TTLCache
+from functionality.monitor_registry import MonitorRegistry
+from functionality import render_plan
+from functionality import delivery
+from functionality import webhooks
+from functionality import title_index
+from functionality import watermark as watermarks
+from functionality.render_plan import RenderContext
 import json
-import aiohttp
-from settings.logging_config import log, get_random_footer, config
+import time
+from settings.logging_config import log, should_log, get_random_footer, config
+
+# 调度设置
+MONITOR_SETTINGS = config.get('monitor', {}) or {}
+MAX_CONCURRENT_MONITORS = int(MONITOR_SETTINGS.get('max_concurrency', 4))
+SCHEDULER_TICK_SECONDS = int(MONITOR_SETTINGS.get('tick_seconds', 15))
+
+# 缓存设置
+CACHE_SETTINGS = config.get('cache', {}) or {}
+RELATION_CACHE_SIZE = int(CACHE_SETTINGS.get('relation_max_entries', 5000))
+RELATION_CACHE_TTL = int(CACHE_SETTINGS.get('relation_ttl_seconds', 600))
+CACHE_MISS = object()
+
+# 发送队列设置
+DELIVERY_SETTINGS = config.get('delivery', {}) or {}
+DELIVERY_QUEUE_SIZE = int(DELIVERY_SETTINGS.get('queue_size', 100))
+DELIVERY_RATE = float(DELIVERY_SETTINGS.get('messages_per_second', 1))
+DELIVERY_BURST = int(DELIVERY_SETTINGS.get('burst', 5))
 
 class NotionMonitor(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db = SessionLocal()
-        self.last_checked = {}
+        self.scheduler = MonitorScheduler(self.check_monitor, max_workers=MAX_CONCURRENT_MONITORS)
+        # 关联页面标题缓存，键为 (Notion密钥, 页面ID)
+        self.related_page_cache = TTLCache(RELATION_CACHE_SIZE, RELATION_CACHE_TTL)
+        # 用户映射缓存，键为guild_id，值为 {Notion用户ID: Discord提及}
+        self.user_map_cache = {}
+        # 监控配置缓存，渲染通知时使用
+        self.monitors = MonitorRegistry(self.db)
+        # 每个监控的发送统计
+        self.delivery_stats = {}
+        # 按频道的发送队列，通知发送不再阻塞轮询
+        self.outbound = delivery.OutboundDispatcher(DELIVERY_QUEUE_SIZE, DELIVERY_RATE, DELIVERY_BURST)
+        self.check_notion_updates.change_interval(seconds=SCHEDULER_TICK_SECONDS)
         self.check_notion_updates.start()
         self.send_startup_notification.start()
+        self.convert_legacy_snapshots.start()
 
         log("Notion监控已初始化", "info")
         
@@ -33,37 +72,36 @@ class NotionMonitor(commands.Cog):
     def cog_unload(self):
         self.check_notion_updates.cancel()
         self.send_startup_notification.cancel()  # 取消启动通知任务
+        self.convert_legacy_snapshots.cancel()
+        self.bot.loop.create_task(self.scheduler.shutdown())
+        self.bot.loop.create_task(self.outbound.shutdown())
+        self.bot.loop.create_task(notion_http.close())  # 关闭共享的Notion连接池
+        self.bot.loop.create_task(webhooks.close())
         log("Notion监控已停止", "info")
 
     @commands.command(name="notion_monitor", aliases=["nm"])
     @commands.has_permissions(administrator=True)
     async def manual_check(self, ctx):
-        """立即执行一次Notion监控检查"""
-        if not utils.checkIfGuildPresent(ctx.guild.id):
-            embed = discord.Embed(
-                description="请先运行 setup 命令进行设置",
-                color=discord.Color.red()
-            )
-            await ctx.send(embed=embed)
+        """立即执行一次本频道监控的检查，结果和定时检查一样发送到频道"""
+        monitor = self.db.query(models.NotionMonitorConfig).filter_by(
+            guild_id=ctx.guild.id,
+            channel_id=ctx.channel.id
+        ).first()
+
+        if not monitor:
+            await ctx.send("此频道未设置监控，请先使用 monitor_setup 命令设置")
+            return
+        if not monitor.is_active:
+            await ctx.send("监控未启动，请先使用 monitor_start 命令启动")
             return
 
-        async with ctx.typing():
-            guild_info = self.bot.guild_info[str(ctx.guild.id)]
-            pages = self.get_notion_pages(guild_info, self.last_checked.get(str(ctx.guild.id), ""))
-            
-            if not pages:
-                embed = discord.Embed(
-                    description="没有发现新的更新",
-                    color=discord.Color.green()
-                )
-                await ctx.send(embed=embed)
-                return
-                
-            for page in pages:
-                message = self.format_page_message(page)
-                await ctx.send(embed=message)
-                
-            self.last_checked[str(ctx.guild.id)] = datetime.utcnow().isoformat()
+        if self.scheduler.is_running(monitor.id):
+            await ctx.send("监控正在检查中，更新会发送到此频道")
+            return
+        # 交给调度器执行，不会和定时检查同时运行
+        self.scheduler.schedule(monitor.id, time.time())
+        self.scheduler.dispatch()
+        await ctx.send("已开始检查，更新会发送到此频道")
 
     @commands.command(name="monitor_config", aliases=["mc"])
     @commands.has_permissions(administrator=True)
@@ -87,6 +125,9 @@ class NotionMonitor(commands.Cog):
                            f"检查间隔: {monitor.interval}分钟\n"
                            f"显示列: {monitor.display_columns}\n"
                            f"标题来源: {current_title}\n"
+                           f"合并发送: {'开启' if monitor.batch_embeds else '关闭'}\n"
+                           f"发送方式: {'Webhook' if monitor.delivery_mode == 'webhook' else '机器人'}\n"
+                           f"Webhook: {webhooks.redact(monitor.webhook_url) or '无'}\n"
                            f"状态: {'活跃' if monitor.is_active else '停止'}",
                 color=discord.Color.blue()
             )
@@ -102,6 +143,7 @@ class NotionMonitor(commands.Cog):
                     return
                 monitor.interval = interval
                 self.db.commit()
+                self.monitors.invalidate(monitor.id)
                 await ctx.send(f"已将检查间隔设置为 {interval} 分钟")
             except ValueError:
                 await ctx.send("请输入有效的数字")
@@ -123,6 +165,7 @@ class NotionMonitor(commands.Cog):
             if value.lower() == "default":
                 monitor.title_column = None
                 self.db.commit()
+                self.monitors.invalidate(monitor.id)
                 await ctx.send("✅ 已恢复默认标题")
                 return
 
@@ -134,12 +177,52 @@ class NotionMonitor(commands.Cog):
 
             monitor.title_column = value
             self.db.commit()
+            self.monitors.invalidate(monitor.id)
             await ctx.send(f"✅ 已设置标题来源为: {value}")
             return
 
+        elif setting == 'batch':
+            if value is None or value.lower() not in ("on", "off"):
+                await ctx.send(f"使用 `{monitor.prefix}mc batch on|off` 开启或关闭合并发送")
+                return
+            monitor.batch_embeds = value.lower() == "on"
+            self.db.commit()
+            self.monitors.invalidate(monitor.id)
+            await ctx.send(f"✅ 已{'开启' if monitor.batch_embeds else '关闭'}合并发送（每条消息最多10个更新）")
+            return
+
+        elif setting == 'delivery':
+            if value is None or value.lower() not in ("bot", "webhook"):
+                await ctx.send(f"使用 `{monitor.prefix}mc delivery bot|webhook` 设置通知发送方式")
+                return
+            if value.lower() == "webhook":
+                webhook_url = await webhooks.ensure_webhook(ctx.channel)
+                if not webhook_url:
+                    await ctx.send("❌ 无法创建Webhook，请给机器人管理Webhook的权限")
+                    return
+                monitor.webhook_url = webhook_url
+            monitor.delivery_mode = value.lower()
+            self.db.commit()
+            self.monitors.invalidate(monitor.id)
+            await ctx.send(f"✅ 已设置发送方式为: {'Webhook' if monitor.delivery_mode == 'webhook' else '机器人'}")
+            return
+
+        elif setting in ('webhook_name', 'webhook_avatar'):
+            if value is None:
+                await ctx.send(f"使用 `{monitor.prefix}mc {setting} <值>` 设置，`{monitor.prefix}mc {setting} default` 恢复默认")
+                return
+            setattr(monitor, setting, None if value.lower() == "default" else value)
+            self.db.commit()
+            self.monitors.invalidate(monitor.id)
+            await ctx.send(f"✅ 已更新 {setting}")
+            return
+
         await ctx.send("无效的设置选项。可用选项:\n"
                       "- interval: 设置检查间隔（分钟）\n"
-                      "- task_name: 设置通知标题来源")
+                      "- task_name: 设置通知标题来源\n"
+                      "- batch: 开启或关闭合并发送\n"
+                      "- delivery: 设置发送方式（bot或webhook）\n"
+                      "- webhook_name / webhook_avatar: 设置Webhook显示的名称和头像")
 
     @commands.command(name="set_notion_channel", aliases=["snc"])
     @commands.has_permissions(administrator=True)
@@ -198,30 +281,34 @@ class NotionMonitor(commands.Cog):
             print(f"解析时间字符串失败: {e}")
             return datetime.utcnow()
 
-    async def compare_page_changes(self, old_content, new_content, guild_id=None):
-        """比较页面变化"""
+    async def compare_page_changes(self, old_snapshot, new_content, guild_id=None, new_fingerprints=None, settings=None):
+        """比较页面变化，old_snapshot是解码后的快照，只格式化指纹发生变化的属性"""
         changes = []
         try:
-            old_props = json.loads(old_content)["properties"]
+            old_props = old_snapshot["properties"]
             new_props = new_content["properties"]
+            # 旧版快照没有保存指纹，现场计算
+            old_fingerprints = old_snapshot.get("fingerprints") or snapshot_store.property_fingerprints(old_props)
+            if new_fingerprints is None:
+                new_fingerprints = snapshot_store.property_fingerprints(new_props)
             
             for prop_name in new_props:
                 if prop_name not in old_props:
                     # 新增的属性
-                    new_value = await self.format_property_value(new_props[prop_name], guild_id)
+                    new_value = await self.format_property_value(new_props[prop_name], guild_id, settings)
                     if new_value:
                         changes.append(f"**新增 {prop_name}**: {new_value}")
-                else:
-                    # 比较现有属性
-                    old_value = await self.format_property_value(old_props[prop_name], guild_id)
-                    new_value = await self.format_property_value(new_props[prop_name], guild_id)
+                elif old_fingerprints.get(prop_name) != new_fingerprints.get(prop_name):
+                    # 原始值有变化时才格式化比较
+                    old_value = await self.format_property_value(old_props[prop_name], guild_id, settings)
+                    new_value = await self.format_property_value(new_props[prop_name], guild_id, settings)
                     if old_value != new_value:
                         changes.append(f"**修改 {prop_name}**: {old_value} → {new_value}")
             
             for prop_name in old_props:
                 if prop_name not in new_props:
                     # 删除的性
-                    old_value = await self.format_property_value(old_props[prop_name], guild_id)
+                    old_value = await self.format_property_value(old_props[prop_name], guild_id, settings)
                     if old_value:
                         changes.append(f"**删 {prop_name}**: {old_value}")
                         
@@ -230,11 +317,11 @@ class NotionMonitor(commands.Cog):
             
         return changes
 
-    async def format_page_message(self, page, selected_columns=None, changes=None, guild_id=None):
-        """将Notion页面格式化为Discord消息"""
+    async def format_page_message(self, page, settings=None, changes=None):
+        """将Notion页面格式化为Discord消息，settings为该监控的MonitorSettings"""
         try:
             # 在debug模式下记录原始数据
-            log(f"处理页面原始数据:\n{json.dumps(page, indent=2, ensure_ascii=False)}", "debug")
+            log(lambda: f"处理页面原始数据:\n{json.dumps(page, indent=2, ensure_ascii=False)}", "debug")
             
             # 获取标题
             if page.get("is_new", False):
@@ -243,43 +330,24 @@ class NotionMonitor(commands.Cog):
                 base_title = "📝 Notion 更新通知"
 
             title = base_title
-            if guild_id:
-                monitor = self.db.query(models.NotionMonitorConfig).filter_by(
-                    guild_id=guild_id
-                ).first()
-                
-                if monitor and monitor.title_column:
-                    if monitor.title_column in page["properties"]:
-                        custom_title = await self.format_property_value(
-                            page["properties"][monitor.title_column],
-                            guild_id
-                        )
-                        if custom_title:
-                            title = f"{base_title}：{custom_title}"
-                            log(f"设置自定义标题: {title}", "debug")
+            guild_id = settings.guild_id if settings else None
+            context = RenderContext(self, guild_id, settings)
+            if settings:
+                plan = render_plan.get_plan(settings, page)
+            else:
+                plan = render_plan.RenderPlan(render_plan.schema_of(page), [])
+
+            custom_title = await plan.render_title(page, context)
+            if custom_title:
+                title = f"{base_title}：{custom_title}"
+                log(f"设置自定义标题: {title}", "debug")
 
             # 获取颜色
             embed_color = discord.Color.blue()
-            for prop_name, prop_data in page.get("properties", {}).items():
-                if prop_data.get("type") in ["select", "multi_select", "status"]:
-                    if prop_data.get("type") == "status" and prop_data.get("status"):
-                        color = prop_data["status"].get("color")
-                        if color:
-                            embed_color = self.notion_color_to_discord(color)
-                            log(f"使用状态颜色: {color}", "debug")
-                            break
-                    elif prop_data.get("type") == "select" and prop_data.get("select"):
-                        color = prop_data["select"].get("color")
-                        if color:
-                            embed_color = self.notion_color_to_discord(color)
-                            log(f"使用选择颜色: {color}", "debug")
-                            break
-                    elif prop_data.get("type") == "multi_select" and prop_data.get("multi_select"):
-                        if prop_data["multi_select"] and prop_data["multi_select"][0].get("color"):
-                            color = prop_data["multi_select"][0]["color"]
-                            embed_color = self.notion_color_to_discord(color)
-                            log(f"使用多选颜色: {color}", "debug")
-                            break
+            color_source, color = plan.pick_color(page)
+            if color:
+                embed_color = self.notion_color_to_discord(color)
+                log(f"使用 {color_source} 的颜色: {color}", "debug")
 
             embed = discord.Embed(
                 title=title,
@@ -288,14 +356,10 @@ class NotionMonitor(commands.Cog):
             )
             
             # 处理选定列
-            if selected_columns:
-                log(f"处理选定列: {selected_columns}", "debug")
-                for column in selected_columns:
-                    if column in page["properties"]:
-                        value = await self.format_property_value(page["properties"][column], guild_id)
-                        if value:
-                            embed.add_field(name=column, value=value, inline=True)
-                            log(f"添加字段 {column}: {value}", "debug")
+            for column, value in await plan.render_columns(page, context):
+                if value:
+                    embed.add_field(name=column, value=value, inline=True)
+                    log(f"添加字段 {column}: {value}", "debug")
             
             # 添加页面链接
             url = page.get("url", "")
@@ -327,334 +391,278 @@ class NotionMonitor(commands.Cog):
                 log(f"添加footer: {footer_text}", "debug")
             
             # 在debug模式下记录最终的消息内容
-            log("最终消息内容:", "debug")
-            log(f"标题: {embed.title}", "debug")
-            log(f"颜色: {embed.color}", "debug")
-            log("字段:", "debug")
-            for field in embed.fields:
-                log(f"  {field.name}: {field.value}", "debug")
+            if should_log("debug"):
+                log("最终消息内容:", "debug")
+                log(f"标题: {embed.title}", "debug")
+                log(f"颜色: {embed.color}", "debug")
+                log("字段:", "debug")
+                for field in embed.fields:
+                    log(f"  {field.name}: {field.value}", "debug")
                 
             return embed
             
         except Exception as e:
             log(f"格式化页面消息时出错: {e}", "info")
-            log(f"页面数据: {json.dumps(page, indent=2, ensure_ascii=False)}", "debug")
+            log(lambda: f"页面数据: {json.dumps(page, indent=2, ensure_ascii=False)}", "debug")
             return None
 
-    async def process_page_updates(self, monitor, pages):
-        """处理页面更新"""
+    async def process_page_updates(self, db, monitor, pages):
+        """处理一批页面更新，快照的读取和写入都按批进行，使用调用方的数据库会话"""
         updates = []
+        snapshot_inserts = []
+        snapshot_updates = []
+        now = snapshot_store.now_timestamp()
+
+        # 一次查询取出整批页面的上一个快照
+        snapshots = snapshot_store.load_snapshots(
+            db, monitor.id, [page["id"] for page in pages]
+        )
+
         for page in pages:
             try:
-                # 查找页面的上一个快照
-                snapshot = self.db.query(models.NotionPageSnapshot).filter_by(
-                    monitor_id=monitor.id,
-                    page_id=page["id"]
-                ).first()
+                snapshot = snapshots.get(page["id"])
+                
+                normalized = snapshot_store.normalize_page(page)
+                fields = snapshot_store.build_snapshot_fields(page, normalized=normalized)
                 
                 if snapshot:
+                    # 内容哈希相同说明需要比较的字段都没变
+                    if snapshot.content_hash == fields["content_hash"]:
+                        continue
                     # 现有页面更新
-                    changes = await self.compare_page_changes(snapshot.content, page, monitor.guild_id)
+                    changes = await self.compare_page_changes(
+                        snapshot_store.decode_snapshot(snapshot), page, monitor.guild_id, normalized["fingerprints"],
+                        self.monitors.get(monitor.id, db)
+                    )
+                    # 新快照
+                    fields.update(id=snapshot.id, last_updated=now)
+                    snapshot_updates.append(fields)
                     if changes:
-                        # 新快照
-                        snapshot.content = json.dumps(page)
-                        snapshot.last_updated = datetime.utcnow().isoformat() + "Z"
                         updates.append((page, changes))
                 else:
                     # 新页面
                     page["is_new"] = True
                     # 创建新快照
-                    new_snapshot = models.NotionPageSnapshot(
-                        monitor_id=monitor.id,
-                        page_id=page["id"],
-                        content=json.dumps(page),
-                        last_updated=datetime.utcnow().isoformat() + "Z"
-                    )
-                    self.db.add(new_snapshot)
+                    fields.update(monitor_id=monitor.id, page_id=page["id"], last_updated=now)
+                    snapshot_inserts.append(fields)
                     updates.append((page, None))
-                    
-                self.db.commit()
                 
             except Exception as e:
                 print(f"处理页面 {page.get('id')} 更新时出错: {e}")
-                
+
+        # 整批写入，只提交一次
+        snapshot_store.save_snapshots(db, snapshot_inserts, snapshot_updates)
+        self.update_title_index(monitor, pages)
         return updates
 
-    @tasks.loop(minutes=1)
+    def update_title_index(self, monitor, pages):
+        """用监控读到的页面更新本地标题索引"""
+        try:
+            title_index.upsert_pages(monitor.database_id, pages)
+        except Exception as e:
+            log(f"更新标题索引失败: {e}", "info")
+
+    @tasks.loop(seconds=15)
     async def check_notion_updates(self):
-        """检查所有活动的监控配置"""
-        monitors = self.db.query(models.NotionMonitorConfig).filter_by(is_active=True).all()
-        
-        for monitor in monitors:
-            try:
-                if monitor.last_checked:
-                    last_check = self.parse_iso_datetime(monitor.last_checked)
-                    if (datetime.utcnow() - last_check).total_seconds() < monitor.interval * 60:
-                        continue
+        """把到期的活动监控交给调度器并发执行"""
+        db = SessionLocal()
+        try:
+            monitors = db.query(models.NotionMonitorConfig).filter_by(is_active=True).all()
+            self.scheduler.sync(monitors)
+        finally:
+            db.close()
+        started = self.scheduler.dispatch()
+        if started:
+            log(f"调度器启动了 {started} 个监控，运行中 {self.scheduler.in_flight_count()} 个", "debug")
+
+    async def check_monitor(self, monitor_id):
+        """检查单个监控的更新，每次运行使用独立的数据库会话，并发的监控互不影响"""
+        db = SessionLocal()
+        try:
+            await self.run_monitor_check(db, monitor_id)
+        finally:
+            db.close()
+
+    async def run_monitor_check(self, db, monitor_id):
+        """出错时抛出异常，由调度器记录失败次数"""
+        monitor = db.query(models.NotionMonitorConfig).get(monitor_id)
+        if not monitor or not monitor.is_active:
+            return
 
-                log(f"开始检查频道 {monitor.channel_id} 的更新", "info")
-                pages = self.get_notion_pages(monitor)
-                
-                if pages:
-                    log(f"找到 {len(pages)} 个更新", "debug")
-                    channel = self.bot.get_channel(monitor.channel_id)
-                    if channel:
-                        updates = await self.process_page_updates(monitor, pages)
-                        for page, changes in updates:
-                            message = await self.format_page_message(
-                                page,
-                                json.loads(monitor.display_columns),
-                                changes,
-                                monitor.guild_id
-                            )
-                            if message:
-                                await channel.send(embed=message)
-
-                monitor.last_checked = datetime.utcnow().isoformat() + "Z"
-                self.db.commit()
-                log(f"完成频道 {monitor.channel_id} 的更新检查", "info")
+        if self.outbound.is_backlogged(monitor.channel_id):
+            # 频道发送队列已满，推迟轮询，last_checked保持不变
+            log(f"频道 {monitor.channel_id} 发送队列已满，推迟本次检查", "info")
+            return
 
-            except Exception as e:
-                log(f"检查监控 {monitor.id} 时出错: {e}", "info")
-                if should_log("debug"):
-                    import traceback
-                    traceback.print_exc()
+        channel = self.bot.get_channel(monitor.channel_id)
+        if channel is None:
+            # 频道不可用时不读取页面，水位线和last_checked都保持不变
+            log(f"找不到频道 {monitor.channel_id}，跳过本次检查", "info")
+            return
+
+        log(f"开始检查频道 {monitor.channel_id} 的更新", "info")
+        started = datetime.utcnow().isoformat() + "Z"
+        watermark = watermarks.Watermark.from_monitor(monitor)
+        pages_iter = self.get_notion_pages(monitor, watermark)
+        try:
+            # 边下载边处理：第一批页面处理和发送时，后续批次仍在下载
+            async for pages in pages_iter:
+                if not pages:
+                    continue
+                # 每个页面最多一条通知，先预留位置；队列已满时停止本次检查，
+                # 这批页面的快照还没写入，下次检查从水位线继续
+                if not self.outbound.reserve(channel, len(pages)):
+                    log(f"频道 {monitor.channel_id} 发送队列已满，停在水位线 {monitor.watermark_time}", "info")
+                    return
+                try:
+                    updates = await self.process_page_updates(db, monitor, pages)
+                    settings = self.monitors.get(monitor.id, db)
+                    messages = []
+                    page_ids = []
+                    for page, changes in updates:
+                        message = await self.format_page_message(page, settings, changes)
+                        if message:
+                            messages.append(message)
+                            page_ids.append(page["id"])
+                    self.outbound.enqueue(
+                        channel,
+                        messages,
+                        batch=settings.batch_embeds,
+                        stats=self.delivery_stats.setdefault(monitor.id, delivery.DeliveryStats()),
+                        target=await self.get_delivery_target(db, monitor, settings, channel),
+                        page_ids=page_ids
+                    )
+                finally:
+                    self.outbound.release(channel, len(pages))
+                # 页面按last_edited_time升序返回，每批处理完就推进水位线，中途失败也不会重复通知
+                watermark.advance(pages)
+                watermark.save(monitor)
+                db.commit()
+        except notion_http.NotionAPIError:
+            # 查询失败时水位线停在已处理的页面，下一轮从这里继续
+            log(f"频道 {monitor.channel_id} 查询失败，保留水位线 {monitor.watermark_time}", "info")
+            raise
+        finally:
+            await pages_iter.aclose()
+
+        # last_checked只用于调度，记录本次检查的开始时间
+        monitor.last_checked = started
+        db.commit()
+        log(f"完成频道 {monitor.channel_id} 的更新检查", "info")
+
+    async def get_delivery_target(self, db, monitor, settings, channel):
+        """webhook模式下返回WebhookTarget，Webhook被删除时重新创建；机器人模式返回None"""
+        if settings.delivery_mode != "webhook":
+            return None
+        if not settings.webhook_url or webhooks.is_invalid(settings.webhook_url):
+            webhook_url = await webhooks.ensure_webhook(channel)
+            if not webhook_url:
+                return None
+            monitor.webhook_url = webhook_url
+            db.commit()
+            self.monitors.invalidate(monitor.id)
+            settings = self.monitors.get(monitor.id, db)
+        return webhooks.WebhookTarget(settings.webhook_url, settings.webhook_name, settings.webhook_avatar)
 
     @check_notion_updates.before_loop
     async def before_check(self):
         await self.bot.wait_until_ready()
 
-    def get_notion_pages(self, monitor):
-        """获取自上次检查以来更新的Notion页面"""
+    async def get_notion_pages(self, monitor, watermark):
+        """
+        获取水位线之后（含水位线时间）编辑过的Notion页面，按last_edited_time升序
+        异步生成器，每收到一页游标结果就yield一批页面，上次已处理的页面会被过滤，请求失败时抛出NotionAPIError
+        """
+        log(f"水位线: {watermark.time}，同一时间已处理 {len(watermark.page_ids)} 个页面", "debug")
+        
+        query_data = {
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]
+        }
+        query_filter = watermark.query_filter()
+        if query_filter:
+            query_data["filter"] = query_filter
+        
+        log(f"正在查询Notion数据库: {monitor.database_id}", "debug")
+        log(lambda: f"查询条件: {json.dumps(query_data, indent=2)}", "debug")
+        
+        pages_iter = notion_http.iter_query_database(
+            monitor.notion_api_key, monitor.database_id, query_data
+        )
         try:
-            log(f"上次检查时间: {monitor.last_checked}", "debug")
-            
-            url = "https://api.notion.com/v1/databases/" + monitor.database_id + "/query"
-            headers = {
-                'Authorization': monitor.notion_api_key,
-                'Notion-Version': '2021-08-16',
-                'Content-Type': 'application/json'
-            }
-            
-            query_data = {
-                "filter": {
-                    "timestamp": "last_edited_time",
-                    "last_edited_time": {
-                        "after": monitor.last_checked
-                    }
-                }
-            }
-            
-            log(f"正在查询Notion数据库: {monitor.database_id}", "debug")
-            log(f"查询条件: {json.dumps(query_data, indent=2)}", "debug")
-            
-            payload = json.dumps(query_data)
-            response = requests.post(url, headers=headers, data=payload)
-            
-            log(f"Notion API响应状态码: {response.status_code}", "debug")
-            if response.status_code == 200:
-                result = response.json()
-                log(f"找到 {len(result.get('results', []))} 条更新", "debug")
-                return result.get("results", [])
-            else:
-                log(f"Notion API错误响应: {response.text}", "info")
-                return []
-                
-        except Exception as e:
-            log(f"从Notion获取页面时出错: {e}", "info")
-            return []
+            async for pages in pages_iter:
+                pages = [page for page in pages if not watermark.is_seen(page)]
+                log(f"找到 {len(pages)} 条更新", "debug")
+                yield pages
+        finally:
+            # 调用方提前停止时取消已经发出的下一页请求
+            await pages_iter.aclose()
+
+    async def fetch_related_page(self, notion_api_key, page_id):
+        """从Notion获取单个关联页面的标题和链接，页面不存在或无标题时返回None"""
+        status, page = await notion_http.get_page(notion_api_key, page_id)
+        if status == 404:
+            return None
+        if status != 200:
+            raise notion_http.NotionAPIError(status, page)
+
+        # 获取页面标题
+        title = None
+        for prop_name, prop_data in page["properties"].items():
+            if prop_data["type"] == "title":
+                title_list = prop_data.get("title", [])
+                if title_list and len(title_list) > 0:
+                    title = title_list[0].get("plain_text", "无标题")
+                break
+
+        if not title:
+            return None
+        return {
+            'title': title,
+            'url': page.get('url', '')
+        }
 
     async def get_related_pages(self, monitor, page_ids):
-        """获取关联页面的信息"""
+        """获取关联页面的信息，优先使用缓存，未命中的页面并发获取"""
         try:
-            results = []
+            cached = {}
+            missing = []
             for page_id in page_ids:
-                url = f"https://api.notion.com/v1/pages/{page_id}"
-                headers = {
-                    'Authorization': monitor.notion_api_key,
-                    'Notion-Version': '2021-08-16'
-                }
-                
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            page = await response.json()
-                            # 获取页面标题
-                            title = None
-                            for prop_name, prop_data in page["properties"].items():
-                                if prop_data["type"] == "title":
-                                    title_list = prop_data.get("title", [])
-                                    if title_list and len(title_list) > 0:
-                                        title = title_list[0].get("plain_text", "无标题")
-                                    break
-                            
-                            if title:
-                                results.append({
-                                    'title': title,
-                                    'url': page.get('url', '')
-                                })
-            
-            return results
+                value = self.related_page_cache.get((monitor.notion_api_key, page_id), CACHE_MISS)
+                if value is CACHE_MISS:
+                    missing.append(page_id)
+                else:
+                    cached[page_id] = value
+
+            if missing:
+                fetched = await asyncio.gather(
+                    *[self.fetch_related_page(monitor.notion_api_key, page_id) for page_id in missing],
+                    return_exceptions=True
+                )
+                for page_id, result in zip(missing, fetched):
+                    if isinstance(result, Exception):
+                        log(f"获取关联页面 {page_id} 失败: {result}", "debug")
+                        continue
+                    self.related_page_cache.set((monitor.notion_api_key, page_id), result)
+                    cached[page_id] = result
+
+            # 保持关联顺序
+            return [cached[page_id] for page_id in page_ids if cached.get(page_id)]
         except Exception as e:
             print(f"获取关联页面时出错: {e}")
             return []
 
-    async def format_property_value(self, property_data, guild_id=None):
-        """格式化Notion属性值"""
+    async def format_property_value(self, property_data, guild_id=None, settings=None):
+        """格式化Notion属性值，settings为所属监控的MonitorSettings"""
         try:
             property_type = property_data.get("type")
             if not property_type:
                 return None
-                
-            if property_type == "select":
-                select_data = property_data.get("select")
-                if select_data:
-                    return select_data.get("name", "")
-                return None
-            
-            elif property_type == "status":
-                select_data = property_data.get("status")
-                if select_data:
-                    return select_data.get("name", "")
-                return None
-                
-            elif property_type == "multi_select":
-                multi_select = property_data.get("multi_select", [])
-                return ", ".join([item.get("name", "") for item in multi_select])
-                
-            elif property_type == "title":
-                text_list = property_data.get("title", [])
-                formatted_texts = []
-                
-                for text_item in text_list:
-                    if text_item.get("type") == "mention" and text_item["mention"].get("type") == "user":
-                        # 处理用户提及
-                        user_id = text_item["mention"]["user"].get("id")
-                        if guild_id and user_id:
-                            # 查找用户映射
-                            user_map = self.db.query(models.NotionDiscordUserMap).filter_by(
-                                guild_id=guild_id,
-                                notion_user_id=user_id
-                            ).first()
-                            if user_map:
-                                formatted_texts.append(user_map.discord_mention)
-                            else:
-                                formatted_texts.append(f"`{user_id}`")
-                    else:
-                        # 处理普通文本
-                        formatted_texts.append(text_item.get("plain_text", ""))
-                
-                return "".join(formatted_texts) if formatted_texts else None
-                    
-            elif property_type == "rich_text":
-                text_list = property_data.get("rich_text", [])
-                formatted_texts = []
-                
-                for text_item in text_list:
-                    if text_item.get("type") == "mention" and text_item["mention"].get("type") == "user":
-                        # 处理用户提及
-                        user_id = text_item["mention"]["user"].get("id")
-                        if guild_id and user_id:
-                            # 查找用户映射
-                            user_map = self.db.query(models.NotionDiscordUserMap).filter_by(
-                                guild_id=guild_id,
-                                notion_user_id=user_id
-                            ).first()
-                            if user_map:
-                                formatted_texts.append(user_map.discord_mention)
-                            else:
-                                formatted_texts.append(f"`{user_id}`")
-                        else:
-                            formatted_texts.append(text_item.get("plain_text", ""))
-                    else:
-                        # 处理普通文本
-                        formatted_texts.append(text_item.get("plain_text", ""))
-                
-                return " ".join(formatted_texts) if formatted_texts else None
-                    
-            elif property_type == "date":
-                date_data = property_data.get("date")
-                if date_data:
-                    start = date_data.get("start", "")
-                    end = date_data.get("end", "")
-                    if end:
-                        return f"{start} 至 {end}"
-                    return start
-                    
-            elif property_type == "people":
-                if guild_id:
-                    return self.format_user_value(property_data.get("people", []), guild_id)
-                else:
-                    people = property_data.get("people", [])
-                    return ", ".join([person.get("name", "未知") for person in people])
-                    
-            elif property_type == "files":
-                files = property_data.get("files", [])
-                return ", ".join([
-                    f"[{file.get('name', '文件')}]({file.get('file', {}).get('url', '')})"
-                    for file in files
-                ])
-                
-            elif property_type == "checkbox":
-                return "✅" if property_data.get("checkbox") else "❌"
-                
-            elif property_type == "number":
-                return str(property_data.get("number", ""))
-                
-            elif property_type == "url":
-                url = property_data.get("url", "")
-                return f"[链接]({url})" if url else ""
-                
-            elif property_type == "email":
-                return property_data.get("email", "")
-                
-            elif property_type == "phone_number":
-                return property_data.get("phone_number", "")
-                
-            elif property_type == "formula":
-                formula = property_data.get("formula", {})
-                return str(formula.get("string") or formula.get("number") or 
-                         formula.get("boolean") or formula.get("date", ""))
-                
-            elif property_type == "created_time":
-                return property_data.get("created_time", "")
-                
-            elif property_type == "last_edited_time":
-                return property_data.get("last_edited_time", "")
-                
-            elif property_type == "relation":
-                relation_data = property_data.get("relation", [])
-                if not relation_data:
-                    return None
-                    
-                # 获取所有关联页面的ID
-                page_ids = [item["id"] for item in relation_data]
-                if not page_ids:
-                    return None
-                    
-                # 如果没有提供guild_id，只返回ID列表
-                if not guild_id:
-                    return ", ".join([f"`{id}`" for id in page_ids])
-                    
-                # 获取guild_info
-                guild_info = self.bot.guild_info[str(guild_id)]
-                
-                # 直接调用异步函数
-                related_pages = await self.get_related_pages(guild_info, page_ids)
-                
-                # 格式化为标题和链接
-                if related_pages:
-                    return "\n".join([
-                        f"[{page['title']}]({page['url']})"
-                        for page in related_pages
-                    ])
-                return None
-                
-            return str(property_data.get(property_type, ""))
+            formatter = render_plan.get_formatter(property_type)
+            return await formatter(property_data, RenderContext(self, guild_id, settings))
             
         except Exception as e:
-            print(f"格式化属性值时出错: {e}")
-            print(f"属性数据: {json.dumps(property_data, indent=2)}")
+            log(f"格式化属性值时出错: {e}", "info")
+            log(lambda: f"属性数据: {json.dumps(property_data, indent=2)}", "debug")
             return None
 
     def format_default_message(self, page, embed):
@@ -789,8 +797,10 @@ class NotionMonitor(commands.Cog):
             monitor.display_columns = json.dumps(selected_columns)
             monitor.is_active = True
             monitor.last_checked = datetime.utcnow().isoformat() + "Z"
+            watermarks.reset(monitor, monitor.last_checked)
             
             self.db.commit()
+            self.monitors.invalidate(monitor.id)
 
             # 创建初始快照
             await ctx.send("正在创建数据库快照，这可能需要一些时间...")
@@ -817,56 +827,46 @@ class NotionMonitor(commands.Cog):
 
     async def get_database_structure_with_key(self, notion_api_key, database_id):
         """获取数据库的列结构"""
-        url = f"https://api.notion.com/v1/databases/{database_id}"
-        headers = {
-            'Authorization': notion_api_key,
-            'Notion-Version': '2021-08-16'
-        }
-        
         log(f"正在获取数据库结构: {database_id}", "debug")
-        log(f"API URL: {url}", "debug")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    log(f"API响应状态码: {response.status}", "debug")
+            status, data = await notion_http.get_database(notion_api_key, database_id)
+            log(f"API响应状态码: {status}", "debug")
+            
+            if status == 200:
+                log(lambda: f"获取到原始数据库结构:\n{json.dumps(data, indent=2, ensure_ascii=False)}", "debug")
+                
+                # 处理每个属性，包括relation类型
+                properties = {}
+                for name, prop in data['properties'].items():
+                    prop_type = prop['type']
+                    log(f"处理属性 {name} (类型: {prop_type})", "debug")
                     
-                    if response.status == 200:
-                        data = await response.json()
-                        log(f"获取到原始数据库结构:\n{json.dumps(data, indent=2, ensure_ascii=False)}", "debug")
-                        
-                        # 处理每个属性，包括relation类型
-                        properties = {}
-                        for name, prop in data['properties'].items():
-                            prop_type = prop['type']
-                            log(f"处理属性 {name} (类型: {prop_type})", "debug")
-                            
-                            if prop_type == 'relation':
-                                # 获取关联数据库的信息
-                                relation_info = prop.get('relation', {})
-                                if isinstance(relation_info, dict):
-                                    db_id = relation_info.get('database_id')
-                                    if db_id:
-                                        properties[name] = f"relation (Database: {db_id})"
-                                else:
-                                    # 如果是数组类型的relation
-                                    properties[name] = "relation (Multiple)"
-                                log(f"处理relation属性 {name}: {properties[name]}", "debug")
-                            elif prop_type == 'rollup':
-                                # 处理rollup类型
-                                properties[name] = "rollup"
-                                log(f"处理rollup属性 {name}", "debug")
-                            else:
-                                properties[name] = prop_type
-                                log(f"处理普通属性 {name}: {prop_type}", "debug")
-                        
-                        log(f"处理后的数据库结构:\n{json.dumps(properties, indent=2, ensure_ascii=False)}", "debug")
-                        return properties
+                    if prop_type == 'relation':
+                        # 获取关联数据库的信息
+                        relation_info = prop.get('relation', {})
+                        if isinstance(relation_info, dict):
+                            db_id = relation_info.get('database_id')
+                            if db_id:
+                                properties[name] = f"relation (Database: {db_id})"
+                        else:
+                            # 如果是数组类型的relation
+                            properties[name] = "relation (Multiple)"
+                        log(f"处理relation属性 {name}: {properties[name]}", "debug")
+                    elif prop_type == 'rollup':
+                        # 处理rollup类型
+                        properties[name] = "rollup"
+                        log(f"处理rollup属性 {name}", "debug")
                     else:
-                        error_text = await response.text()
-                        log(f"获取数据库结构失败: HTTP {response.status}", "info")
-                        log(f"错误响应: {error_text}", "debug")
-                        return None
+                        properties[name] = prop_type
+                        log(f"处理普通属性 {name}: {prop_type}", "debug")
+                
+                log(lambda: f"处理后的数据库结构:\n{json.dumps(properties, indent=2, ensure_ascii=False)}", "debug")
+                return properties
+            else:
+                log(f"获取数据库结构失败: HTTP {status}", "info")
+                log(f"错误响应: {data}", "debug")
+                return None
         except Exception as e:
             log(f"获取数据库结构时发生错误: {str(e)}", "info")
             import traceback
@@ -888,7 +888,9 @@ class NotionMonitor(commands.Cog):
             
         monitor.is_active = True
         monitor.last_checked = datetime.utcnow().isoformat() + "Z"  # 添��初始检查时间
+        watermarks.reset(monitor, monitor.last_checked)
         self.db.commit()
+        self.monitors.invalidate(monitor.id)
         await ctx.send("监控已启动")
 
     @commands.command(name="monitor_stop", aliases=["mstop"])
@@ -906,6 +908,7 @@ class NotionMonitor(commands.Cog):
             
         monitor.is_active = False
         self.db.commit()
+        self.monitors.invalidate(monitor.id)
         await ctx.send("监控已停止")
 
     @tasks.loop(count=1)  # 只执行一次
@@ -1000,6 +1003,52 @@ class NotionMonitor(commands.Cog):
         """等待机器人准备就绪"""
         await self.bot.wait_until_ready()
 
+    @tasks.loop(count=1)  # 只执行一次
+    async def convert_legacy_snapshots(self):
+        """后台把旧版完整JSON快照分批转换为压缩格式"""
+        try:
+            total = 0
+            after_id = 0
+            while after_id is not None:
+                converted, after_id = snapshot_store.convert_legacy_batch(self.db, after_id)
+                total += converted
+                # 每批之间让出事件循环
+                await asyncio.sleep(0.1)
+            if total:
+                log(f"已将 {total} 个旧快照转换为压缩格式", "info")
+        except Exception as e:
+            log(f"转换旧快照时出错: {e}", "info")
+
+    @commands.command(name="snapshot_stats", aliases=["sst"])
+    @commands.has_permissions(administrator=True)
+    async def snapshot_stats(self, ctx):
+        """显示本服务器各监控的快照存储大小"""
+        monitors = self.db.query(models.NotionMonitorConfig).filter_by(
+            guild_id=ctx.guild.id
+        ).all()
+        if not monitors:
+            await ctx.send("此服务器未设置监控")
+            return
+
+        report = snapshot_store.size_report(self.db, [monitor.id for monitor in monitors])
+        embed = discord.Embed(title="快照存储统计", color=discord.Color.blue())
+        for monitor in monitors:
+            stats = report.get(monitor.id)
+            if not stats:
+                continue
+            saved = stats["raw_bytes"] - stats["stored_bytes"]
+            ratio = (saved / stats["raw_bytes"] * 100) if stats["raw_bytes"] else 0
+            embed.add_field(
+                name=f"#{monitor.id} <#{monitor.channel_id}>",
+                value=f"快照数: {stats['rows']} (未转换 {stats['legacy_rows']})\n"
+                      f"存储: {stats['stored_bytes'] / 1024:.1f} KB / 原始: {stats['raw_bytes'] / 1024:.1f} KB\n"
+                      f"节省: {saved / 1024:.1f} KB ({ratio:.0f}%)",
+                inline=False
+            )
+        if not embed.fields:
+            embed.description = "暂无快照"
+        await ctx.send(embed=embed)
+
     @commands.command(name="map_users", aliases=["mu"])
     @commands.has_permissions(administrator=True)
     async def map_users(self, ctx, notion_id: str = None):
@@ -1067,6 +1116,7 @@ class NotionMonitor(commands.Cog):
                 if mapping:
                     self.db.delete(mapping)
                     self.db.commit()
+                    self.invalidate_user_mappings(ctx.guild.id)
                     await ctx.send(f"✅ 已删除户ID `{notion_id}` 的射")
                 else:
                     await ctx.send(f"❌ 未找到用户ID `{notion_id}` 的映射")
@@ -1096,6 +1146,7 @@ class NotionMonitor(commands.Cog):
                 print(f"新增映射: {notion_id} -> {discord_mention} (新增)")
 
             self.db.commit()
+            self.invalidate_user_mappings(ctx.guild.id)
             await ctx.send(f"✅ 已映射 `{notion_id}` → {discord_mention}")
 
         except Exception as e:
@@ -1104,44 +1155,47 @@ class NotionMonitor(commands.Cog):
             traceback.print_exc()  # 添加详细的错误跟踪
             await ctx.send(f"❌ 设置失败: {str(e)}")
 
+    def get_user_mappings(self, guild_id):
+        """获取服务器的用户映射，首次访问时从数据库加载"""
+        mappings = self.user_map_cache.get(guild_id)
+        if mappings is None:
+            mappings = {
+                m.notion_user_id: m.discord_mention
+                for m in self.db.query(models.NotionDiscordUserMap).filter_by(guild_id=guild_id).all()
+            }
+            self.user_map_cache[guild_id] = mappings
+            log(f"已加载服务器 {guild_id} 的 {len(mappings)} 个用户映射", "debug")
+        return mappings
+
+    def invalidate_user_mappings(self, guild_id):
+        """用户映射变更后清除缓存，下次使用时重新加载"""
+        self.user_map_cache.pop(guild_id, None)
+
     def format_user_value(self, users_data, guild_id):
         """格式化用户属性值"""
         try:
             if not users_data:
                 return None
 
-            print(f"格式化用户数据: {json.dumps(users_data, indent=2)}")
-            print(f"Guild ID: {guild_id}")
-
             # 获取该服务器的所有用户映射
-            user_mappings = {
-                m.notion_user_id: m.discord_mention 
-                for m in self.db.query(models.NotionDiscordUserMap).filter_by(guild_id=guild_id).all()
-            }
-            print(f"用户映射: {json.dumps(user_mappings, indent=2)}")
+            user_mappings = self.get_user_mappings(guild_id)
 
             formatted_users = []
             for user in users_data:
                 user_id = user.get("id")
                 if not user_id:
-                    print(f"跳过无效用户数: {json.dumps(user, indent=2)}")
                     continue
                     
                 discord_mention = user_mappings.get(user_id)
                 if discord_mention:
                     formatted_users.append(discord_mention)
-                    print(f"用户 {user_id} 映射到 {discord_mention}")
                 else:
                     formatted_users.append(f"`{user_id}`")
-                    print(f"用户 {user_id} 未找到映射")
 
-            result = ", ".join(formatted_users) if formatted_users else None
-            print(f"最终格式化结果: {result}")
-            return result
+            return ", ".join(formatted_users) if formatted_users else None
 
         except Exception as e:
-            print(f"格式化用户值时出错: {e}")
-            print(f"用户数据: {json.dumps(users_data, indent=2)}")
+            log(f"格式化用户值时出错: {e}", "info")
             return None
 
     async def create_initial_snapshots(self, monitor):
@@ -1149,56 +1203,30 @@ class NotionMonitor(commands.Cog):
         try:
             print(f"正在为数据库 {monitor.database_id} 创建初始快照...")
             
-            url = "https://api.notion.com/v1/databases/" + monitor.database_id + "/query"
-            headers = {
-                'Authorization': monitor.notion_api_key,
-                'Notion-Version': '2021-08-16',
-                'Content-Type': 'application/json'
-            }
-            
             # 查询所有页面
-            has_more = True
-            start_cursor = None
             total_pages = 0
             
-            while has_more:
-                query_data = {}
-                if start_cursor:
-                    query_data["start_cursor"] = start_cursor
-                
-                payload = json.dumps(query_data)
-                response = requests.post(url, headers=headers, data=payload)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    pages = result.get("results", [])
-                    
-                    # 为每个页面创建快照
+            try:
+                async for pages in notion_http.iter_query_database(
+                    monitor.notion_api_key, monitor.database_id
+                ):
+                    # 为每批页面中还没有快照的页面创建快照
+                    existing = snapshot_store.load_snapshots(
+                        self.db, monitor.id, [page["id"] for page in pages]
+                    )
+                    now = snapshot_store.now_timestamp()
+                    new_snapshots = []
                     for page in pages:
-                        # 检查是否已存在快照
-                        existing = self.db.query(models.NotionPageSnapshot).filter_by(
-                            monitor_id=monitor.id,
-                            page_id=page["id"]
-                        ).first()
-                        
-                        if not existing:
-                            new_snapshot = models.NotionPageSnapshot(
-                                monitor_id=monitor.id,
-                                page_id=page["id"],
-                                content=json.dumps(page),
-                                last_updated=datetime.utcnow().isoformat() + "Z"
-                            )
-                            self.db.add(new_snapshot)
-                            total_pages += 1
-                    
-                    self.db.commit()
-                    
-                    # 检查是否还有更多页面
-                    has_more = result.get("has_more", False)
-                    start_cursor = result.get("next_cursor")
-                else:
-                    print(f"获取页面失败: {response.text}")
-                    break
+                        if page["id"] in existing:
+                            continue
+                        fields = snapshot_store.build_snapshot_fields(page)
+                        fields.update(monitor_id=monitor.id, page_id=page["id"], last_updated=now)
+                        new_snapshots.append(fields)
+                    snapshot_store.save_snapshots(self.db, new_snapshots, [])
+                    self.update_title_index(monitor, pages)
+                    total_pages += len(new_snapshots)
+            except notion_http.NotionAPIError as e:
+                print(f"获取页面失败: {e}")
             
             print(f"初始快照创建完，共处理 {total_pages} 个页面")
             
@@ -1223,6 +1251,63 @@ class NotionMonitor(commands.Cog):
         }
         return color_map.get(notion_color, color_map["default"])
 
+    @commands.command(name="monitor_status", aliases=["mss"])
+    @commands.has_permissions(administrator=True)
+    async def monitor_status(self, ctx):
+        """显示本服务器各监控的调度状态和延迟"""
+        # 监控检查在自己的会话中提交，丢弃命令会话里的旧数据
+        self.db.expire_all()
+        monitors = self.db.query(models.NotionMonitorConfig).filter_by(
+            guild_id=ctx.guild.id
+        ).all()
+
+        if not monitors:
+            await ctx.send("此服务器未设置监控")
+            return
+
+        cache = self.related_page_cache
+        embed = discord.Embed(
+            title="监控调度状态",
+            description=f"最大并发数: {self.scheduler.max_workers}\n"
+                       f"运行中: {self.scheduler.in_flight_count()}\n"
+                       f"关联页面缓存: {len(cache)} 条，命中率 {cache.hit_rate * 100:.0f}%",
+            color=discord.Color.blue()
+        )
+        now = time.time()
+        for monitor in monitors:
+            stats = self.scheduler.stats.get(monitor.id)
+            due = self.scheduler.next_due(monitor.id)
+            lines = [f"状态: {'活跃' if monitor.is_active else '停止'}"]
+            if self.scheduler.is_running(monitor.id):
+                lines.append("正在运行")
+            elif due is not None:
+                lines.append(f"下次检查: {max(due - now, 0):.0f} 秒后")
+            if stats:
+                lines.append(f"运行次数: {stats.runs} (失败 {stats.failures})")
+                lines.append(f"延迟: 最近 {stats.last_lag:.1f}s / 平均 {stats.avg_lag:.1f}s / 最大 {stats.max_lag:.1f}s")
+                lines.append(f"上次耗时: {stats.last_duration:.1f}s")
+            if monitor.watermark_time:
+                lines.append(f"水位线: {monitor.watermark_time}")
+            channel_queue = self.outbound.queues.get(monitor.channel_id)
+            if channel_queue:
+                lines.append(f"发送队列: {channel_queue.depth}/{self.outbound.maxsize}，"
+                             f"延迟 平均 {channel_queue.avg_latency:.1f}s / 最大 {channel_queue.max_latency:.1f}s，"
+                             f"失败 {channel_queue.failed}")
+            sent = self.delivery_stats.get(monitor.id)
+            if sent and sent.embeds:
+                lines.append(f"发送: {sent.embeds} 条通知 / {sent.send_calls} 次调用 (节省 {sent.saved_calls} 次)")
+            if sent and sent.dropped:
+                lines.append(f"发送失败丢弃: {sent.dropped} 条通知")
+            limiter_stats = notion_http.rate_limiters.stats(monitor.notion_api_key)
+            if limiter_stats:
+                lines.append(f"Notion排队: 平均 {limiter_stats.avg_wait:.2f}s / 最大 {limiter_stats.max_wait:.2f}s / 429次数 {limiter_stats.throttled}")
+            embed.add_field(
+                name=f"#{monitor.id} <#{monitor.channel_id}>",
+                value="\n".join(lines),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
     @commands.command(name="set_title", aliases=["st"])
     @commands.has_permissions(administrator=True)
     async def set_title(self, ctx, *, column_name: str = None):
@@ -1252,6 +1337,7 @@ class NotionMonitor(commands.Cog):
         if column_name.lower() == "default":
             monitor.title_column = None
             self.db.commit()
+            self.monitors.invalidate(monitor.id)
             await ctx.send("✅ 已恢复默认标题")
             return
 
@@ -1263,6 +1349,7 @@ class NotionMonitor(commands.Cog):
 
         monitor.title_column = column_name
         self.db.commit()
+        self.monitors.invalidate(monitor.id)
         await ctx.send(f"✅ 已设置标题来源为: {column_name}")
 
 def setup(bot):
@@ -20,7 +20,7 @@ class Search(commands.Cog):
     async def searchByTitleBot(self, ctx, query, client):
         # first get all the data of the database
 
-        search_results = searchByTitle(
+        search_results = await searchByTitle(
             query.strip(), client.notion_db_id, client.notion_api_key
         )
 
@@ -113,6 +113,10 @@ class Search(commands.Cog):
     async def searchTag(self, ctx, *args):
         notion_db = self.guild_data[str(ctx.guild.id)].notion_db_id
         if len(args) > 0:
+            # tags separated by "|" match any tag, otherwise all tags must match
+            mode = "or" if any("|" in tag for tag in args) else "and"
+            args = [tag.replace("|", ",") for tag in args]
+
             # Check if tag exists
             query = ""
 
@@ -120,10 +124,11 @@ class Search(commands.Cog):
                 query = query + tag.strip().lower() + ", "
             query = query.rstrip(", ")
 
-            search_results = searchTag(
+            search_results = await searchTag(
                 notion_db_id=notion_db,
                 notion_api_key=self.guild_data[str(ctx.guild.id)].notion_api_key,
                 tags=getSearchTagsPayload(args),
+                mode=mode,
             )
 
             if len(search_results) > 0:
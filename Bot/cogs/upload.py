@@ -70,13 +70,13 @@ class Upload(commands.Cog):
                 # addData
                 tags = getFileTags(args)
                 author = "@" + str(ctx.author).split("#")[0]
-                addAllData(
+                await addAllData(
                     url, client.notion_api_key, client.notion_db_id, author, tags, title
                 )
             else:
                 # addData
                 author = "@" + str(ctx.author).split("#")[0]
-                addDataWithoutTag(
+                await addDataWithoutTag(
                     url, client.notion_api_key, client.notion_db_id, title, author
                 )
             # send success message
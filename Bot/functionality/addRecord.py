@@ -1,23 +1,17 @@
-import requests
 import json
 from database import SessionLocal, engine
 import models
-from bs4 import BeautifulSoup
+from functionality import notion_http
+from functionality import title_fetcher
 
 db = SessionLocal()
 
 url = "https://api.notion.com/v1/pages"
 
-def getTitle(url):
-    try:
-        request = requests.get(url)
-        soup = BeautifulSoup(request.text, 'html.parser')
-        title_tag = soup.find('title')
-        return title_tag.get_text()
-    except:
-        return None
+async def getTitle(url):
+    return await title_fetcher.get_title(url)
 
-def addAllData(url, notion_api_key, notion_db_id, contributor, tag, title):
+async def addAllData(url, notion_api_key, notion_db_id, contributor, tag, title):
     data_to_be_written = {
         "parent": {
             "database_id": notion_db_id
@@ -59,9 +53,9 @@ def addAllData(url, notion_api_key, notion_db_id, contributor, tag, title):
         }
     }
     payload = json.dumps(data_to_be_written)
-    sendData(payload, notion_api_key)
+    return await sendData(payload, notion_api_key)
 
-def addDataWithoutTag(url, notion_api_key, notion_db_id, title, contributor):
+async def addDataWithoutTag(url, notion_api_key, notion_db_id, title, contributor):
     data_to_be_written = {
         "parent": {
             "database_id": notion_db_id
@@ -99,15 +93,12 @@ def addDataWithoutTag(url, notion_api_key, notion_db_id, title, contributor):
         }
     }
     payload = json.dumps(data_to_be_written)
-    sendData(payload, notion_api_key)
+    return await sendData(payload, notion_api_key)
 
-def sendData(payload, notion_api_key):
-    headers = {
-        'Authorization': notion_api_key,
-        'Notion-Version': '2021-05-13',
-        'Content-Type': 'application/json'
-    }
-
-    response = requests.request("POST", url, headers=headers, data=payload)
-    print(response.text)
-    print(response.status_code)
\ No newline at end of file
+async def sendData(payload, notion_api_key):
+    status, response = await notion_http.create_page(
+        notion_api_key, payload, notion_version='2021-05-13'
+    )
+    print(response)
+    print(status)
+    return response
\ No newline at end of file
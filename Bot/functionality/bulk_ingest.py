@@ -0,0 +1,138 @@
+import asyncio
+import csv
+import io
+import time
+from urllib.parse import urlsplit
+from functionality import notion_http
+from functionality import title_index
+from functionality import url_index
+from functionality import title_fetcher
+from functionality.utils import checkURL, doesItExist
+from functionality.addRecord import addAllData, addDataWithoutTag
+from settings.logging_config import log
+
+# 批量添加链接
+# 每个链接依次经过：去重 -> 获取标题 -> 创建Notion页面，
+# 各链接并发执行，标题请求和页面创建分别用信号量限制并发，
+# 创建页面时还会经过notion_http的限流器，所以不会超过Notion的速率限制。
+
+MAX_LINKS = 1000
+MAX_FILE_BYTES = 1024 * 1024
+TITLE_CONCURRENCY = 16
+CREATE_CONCURRENCY = 3
+
+
+class IngestResult:
+    """批量添加的进度和结果"""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.invalid = []
+        self.duplicates = []
+        self.added = []
+        self.failed = []
+        self.started = time.monotonic()
+
+    @property
+    def done(self):
+        return len(self.duplicates) + len(self.added) + len(self.failed)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+def parse_links(text):
+    """
+    从文本或CSV中取出链接和可选的标题
+    CSV的每一行取第一个链接单元格，同一行第一个非链接单元格作为标题
+    """
+    links = []
+    for row in csv.reader(io.StringIO(text)):
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if len(cells) == 1:
+            # 普通文本：一行可能有多个用空格分隔的链接
+            links.extend((cell, None) for cell in cells[0].split())
+            continue
+        urls = [cell for cell in cells if checkURL(cell)]
+        if urls:
+            titles = [cell for cell in cells if not checkURL(cell)]
+            links.append((urls[0], titles[0] if titles else None))
+    return links
+
+
+def fallback_title(url):
+    """取不到网页标题时用链接的最后一段"""
+    parts = urlsplit(url)
+    last = parts.path.rstrip("/").split("/")[-1]
+    return last or parts.hostname or url
+
+
+def dedupe(links):
+    """去掉无效链接和本批次内重复的链接，返回 (待处理, 无效)"""
+    seen = set()
+    unique = []
+    invalid = []
+    for url, title in links:
+        if not checkURL(url):
+            invalid.append(url)
+            continue
+        key = url_index.normalize_url(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append((url, title))
+    return unique, invalid
+
+
+async def ingest(links, notion_api_key, notion_db_id, contributor, tags=None, on_progress=None):
+    """
+    批量添加链接，tags为None时不写入Tag列
+    on_progress(result)在每个链接处理完后调用
+    """
+    links, invalid = dedupe(links[:MAX_LINKS])
+    result = IngestResult(len(links))
+    result.invalid = invalid
+
+    # 先刷新一次链接索引，之后的重复检查都在内存里完成
+    try:
+        await title_index.ensure_fresh(notion_api_key, notion_db_id)
+        index_ready = True
+    except notion_http.REQUEST_ERRORS as e:
+        log(f"链接索引不可用，逐个查询Notion: {e}", "info")
+        index_ready = False
+
+    title_slots = asyncio.Semaphore(TITLE_CONCURRENCY)
+    create_slots = asyncio.Semaphore(CREATE_CONCURRENCY)
+
+    async def process(url, title):
+        try:
+            if index_ready:
+                exists = url_index.contains(notion_db_id, url)
+            else:
+                exists = await doesItExist(url, notion_api_key, notion_db_id)
+            if exists:
+                result.duplicates.append(url)
+                return
+            if not title:
+                async with title_slots:
+                    title = await title_fetcher.get_title(url) or fallback_title(url)
+            async with create_slots:
+                if tags is not None:
+                    page = await addAllData(url, notion_api_key, notion_db_id, contributor, tags, title)
+                else:
+                    page = await addDataWithoutTag(url, notion_api_key, notion_db_id, title, contributor)
+            if page and page.get("object") == "page":
+                url_index.add(notion_db_id, url, page.get("id"))
+                result.added.append((url, title))
+            else:
+                message = (page or {}).get("message", "unknown error")
+                result.failed.append((url, message))
+        except Exception as e:
+            result.failed.append((url, str(e)))
+        finally:
+            if on_progress:
+                on_progress(result)
+
+    await asyncio.gather(*(process(url, title) for url, title in links))
+    return result
@@ -1,19 +1,15 @@
-import requests
 import json
 from functionality.utils import *
 from functionality.search import *
+from functionality import notion_http
 
-def patch(notion_key, payload, searchObj_toDelete):
-    headers = {
-        'Authorization': notion_key,
-        'Notion-Version': '2021-05-13',
-        'Content-Type': 'application/json'
-    }
-    url = f"https://api.notion.com/v1/pages/{searchObj_toDelete.id}"
-    response = requests.request("PATCH", url, headers=headers, data=payload)
-    print(response.content)
+async def patch(notion_key, payload, searchObj_toDelete):
+    status, response = await notion_http.update_page(
+        notion_key, searchObj_toDelete.id, payload, notion_version='2021-05-13'
+    )
+    print(response)
 
-def deleteWithoutTag(searchObj_toDelete, api_key):
+async def deleteWithoutTag(searchObj_toDelete, api_key):
     payload = json.dumps({
         "properties": {
             "Title": {
@@ -40,9 +36,9 @@ def deleteWithoutTag(searchObj_toDelete, api_key):
             }
         }
     })
-    patch(api_key, payload, searchObj_toDelete)
+    await patch(api_key, payload, searchObj_toDelete)
 
-def deleteAll(searchObj_toDelete, api_key):
+async def deleteAll(searchObj_toDelete, api_key):
     payload = json.dumps({
         "properties": {
             "Title": {
@@ -77,4 +73,4 @@ def deleteAll(searchObj_toDelete, api_key):
             }
         }
     })
-    patch(api_key, payload, searchObj_toDelete)
\ No newline at end of file
+    await patch(api_key, payload, searchObj_toDelete)
\ No newline at end of file
@@ -0,0 +1,206 @@
+import asyncio
+import inspect
+import time
+import discord
+from discord.http import Route
+from functionality.rate_limiter import TokenBucket
+from functionality.webhooks import redact
+from settings.logging_config import log
+
+# Discord单条消息的限制
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_TOTAL_CHARS = 6000
+
+# discord.py 2.x 的 send 支持 embeds 参数，1.7 需要直接调用HTTP接口
+SEND_SUPPORTS_EMBEDS = "embeds" in inspect.signature(discord.abc.Messageable.send).parameters
+
+
+class DeliveryStats:
+    """单个监控的发送统计"""
+
+    def __init__(self):
+        self.embeds = 0
+        self.send_calls = 0
+        # 发送失败被丢弃的通知数
+        self.dropped = 0
+
+    @property
+    def saved_calls(self):
+        """合并发送节省的API调用次数"""
+        return self.embeds - self.send_calls
+
+
+def pack_embeds(embeds):
+    """按顺序把embed分组，每组不超过10个且总字符数不超过6000"""
+    group = []
+    group_size = 0
+    for embed in embeds:
+        size = len(embed)
+        if group and (len(group) >= MAX_EMBEDS_PER_MESSAGE or group_size + size > MAX_EMBED_TOTAL_CHARS):
+            yield group
+            group = []
+            group_size = 0
+        group.append(embed)
+        group_size += size
+    if group:
+        yield group
+
+
+async def send_embeds(channel, embeds):
+    """在一条消息中发送多个embed"""
+    if len(embeds) == 1:
+        return await channel.send(embed=embeds[0])
+    if SEND_SUPPORTS_EMBEDS:
+        return await channel.send(embeds=embeds)
+    route = Route("POST", "/channels/{channel_id}/messages", channel_id=channel.id)
+    return await channel._state.http.request(
+        route, json={"embeds": [embed.to_dict() for embed in embeds]}
+    )
+
+
+class ChannelQueue:
+    """
+    单个频道的发送队列
+    由独立的任务按顺序发送，并记录队列深度和发送延迟
+    节奏由固定速率的令牌桶控制；Discord按路由的速率限制和429重试由discord.py的HTTP客户端处理
+    """
+
+    def __init__(self, channel, maxsize, rate, burst):
+        self.channel = channel
+        self.maxsize = maxsize
+        # 队列本身不限长度，容量由reserve控制，放入时从不等待
+        self.queue = asyncio.Queue()
+        # 轮询已经预留、还没放入队列的位置
+        self.reserved = 0
+        self.bucket = TokenBucket(rate, burst)
+        self.task = asyncio.ensure_future(self.run())
+        self.sent = 0
+        self.failed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def is_full(self):
+        return self.queue.qsize() + self.reserved >= self.maxsize
+
+    def reserve(self, count):
+        """
+        为一批通知预留位置，空间不足时返回False
+        一批比整个队列还大时，只要队列是空的也允许放入，否则这批永远放不进去
+        """
+        count = min(count, self.maxsize)
+        if self.queue.qsize() + self.reserved + count > self.maxsize:
+            return False
+        self.reserved += count
+        return True
+
+    def release(self, count):
+        self.reserved = max(self.reserved - min(count, self.maxsize), 0)
+
+    @property
+    def avg_latency(self):
+        return self.total_latency / self.sent if self.sent else 0.0
+
+    async def run(self):
+        while True:
+            group, enqueued_at, stats, target, page_ids = await self.queue.get()
+            try:
+                await self.bucket.acquire()
+                await self.send(group, target)
+                latency = time.monotonic() - enqueued_at
+                self.sent += 1
+                self.last_latency = latency
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                if stats is not None:
+                    stats.embeds += len(group)
+                    stats.send_calls += 1
+            except Exception as e:
+                # 水位线在放入队列时已经推进，这些页面的变化不会再通知，记录下来便于排查
+                self.failed += 1
+                if stats is not None:
+                    stats.dropped += len(group)
+                log(f"发送到频道 {self.channel.id} 失败，丢弃 {len(group)} 条通知，"
+                    f"页面: {', '.join(page_ids) if page_ids else '未知'}: {redact(e)}", "info")
+            finally:
+                self.queue.task_done()
+
+    async def send_once(self, group, target):
+        if target is not None:
+            return await target.send(group)
+        return await send_embeds(self.channel, group)
+
+    async def send(self, group, target=None):
+        """发送一组embed，target为Webhook时通过Webhook发送，Webhook已被删除时改用机器人发送"""
+        try:
+            await self.send_once(group, target)
+        except discord.NotFound:
+            if target is None:
+                raise
+            await send_embeds(self.channel, group)
+
+
+class OutboundDispatcher:
+    """
+    按频道分发的发送队列
+    轮询先用reserve为一批页面预留位置，预留失败就停止本次轮询，enqueue从不等待，
+    不会在调度器的工作槽里等Discord发送；is_backlogged可以让调度器推迟该频道的轮询
+    """
+
+    def __init__(self, maxsize=100, rate=1.0, burst=5):
+        self.maxsize = maxsize
+        self.rate = rate
+        self.burst = burst
+        self.queues = {}
+
+    def get_queue(self, channel):
+        channel_queue = self.queues.get(channel.id)
+        if channel_queue is None or channel_queue.task.done():
+            channel_queue = ChannelQueue(channel, self.maxsize, self.rate, self.burst)
+            self.queues[channel.id] = channel_queue
+        return channel_queue
+
+    def is_backlogged(self, channel_id):
+        channel_queue = self.queues.get(channel_id)
+        return channel_queue is not None and channel_queue.is_full()
+
+    def reserve(self, channel, count):
+        """为最多count条通知预留位置，频道队列已满时返回False"""
+        return self.get_queue(channel).reserve(count)
+
+    def release(self, channel, count):
+        """归还reserve预留的位置，放入队列后或处理失败时调用"""
+        self.get_queue(channel).release(count)
+
+    def enqueue(self, channel, embeds, batch=False, stats=None, target=None, page_ids=None):
+        """
+        按顺序放入队列，不会等待，调用前应先用reserve预留位置
+        batch为True时合并为多embed消息，target为Webhook时通过Webhook发送
+        page_ids与embeds一一对应，发送失败时记录在日志中
+        """
+        channel_queue = self.get_queue(channel)
+        groups = pack_embeds(embeds) if batch else ([embed] for embed in embeds)
+        offset = 0
+        for group in groups:
+            group_page_ids = page_ids[offset:offset + len(group)] if page_ids else None
+            offset += len(group)
+            channel_queue.queue.put_nowait((group, time.monotonic(), stats, target, group_page_ids))
+
+    async def shutdown(self):
+        tasks = [channel_queue.task for channel_queue in self.queues.values()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # 队列中还没发送的通知也会丢失
+        for channel_id, channel_queue in self.queues.items():
+            page_ids = []
+            while not channel_queue.queue.empty():
+                group, enqueued_at, stats, target, group_page_ids = channel_queue.queue.get_nowait()
+                page_ids.extend(group_page_ids or ())
+            if page_ids:
+                log(f"停止时频道 {channel_id} 还有未发送的通知，页面: {', '.join(page_ids)}", "info")
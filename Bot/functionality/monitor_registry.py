@@ -0,0 +1,55 @@
+import json
+import models
+
+
+class MonitorSettings:
+    """渲染通知时需要的监控配置，display_columns已解析为列表"""
+
+    def __init__(self, monitor):
+        self.id = monitor.id
+        self.guild_id = monitor.guild_id
+        self.channel_id = monitor.channel_id
+        self.notion_api_key = monitor.notion_api_key
+        self.database_id = monitor.database_id
+        self.interval = monitor.interval
+        self.title_column = monitor.title_column
+        self.batch_embeds = bool(monitor.batch_embeds)
+        self.delivery_mode = monitor.delivery_mode or "bot"
+        self.webhook_url = monitor.webhook_url
+        self.webhook_name = monitor.webhook_name
+        self.webhook_avatar = monitor.webhook_avatar
+        try:
+            self.display_columns = json.loads(monitor.display_columns or "[]")
+        except ValueError:
+            self.display_columns = []
+        # 渲染计划在第一次渲染时按页面属性结构编译
+        self.render_plan = None
+
+
+class MonitorRegistry:
+    """
+    监控配置的内存缓存，按监控ID索引
+    修改监控配置的命令需要调用invalidate，渲染通知时不再访问数据库
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._settings = {}
+
+    def get(self, monitor_id, db=None):
+        """db为后台任务自己的会话，不传时使用命令共用的会话"""
+        settings = self._settings.get(monitor_id)
+        if settings is None:
+            monitor = (db or self.db).query(models.NotionMonitorConfig).get(monitor_id)
+            if monitor is None:
+                return None
+            settings = MonitorSettings(monitor)
+            self._settings[monitor_id] = settings
+        return settings
+
+    def invalidate(self, monitor_id=None):
+        """清除单个监控的配置缓存，不传ID时全部清除"""
+        if monitor_id is None:
+            self._settings.clear()
+        else:
+            self._settings.pop(monitor_id, None)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import random
+import aiohttp
+from functionality.rate_limiter import RateLimiterRegistry
+from settings.logging_config import log, config
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2021-08-16"
+
+# 连接池设置：所有Notion请求共用一个keep-alive连接池
+POOL_LIMIT = 20
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+
+# 限流设置：Notion每个集成大约允许每秒3个请求
+NOTION_SETTINGS = config.get('notion', {}) or {}
+REQUESTS_PER_SECOND = float(NOTION_SETTINGS.get('requests_per_second', 3))
+BURST = int(NOTION_SETTINGS.get('burst', 3))
+MAX_RETRIES = int(NOTION_SETTINGS.get('max_retries', 5))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 重复执行没有副作用的方法，5xx和网络错误时可以安全重试
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+rate_limiters = RateLimiterRegistry(REQUESTS_PER_SECOND, BURST)
+
+_session = None
+
+
+class NotionAPIError(Exception):
+    """Notion API返回非200状态码"""
+
+    def __init__(self, status, body):
+        super().__init__(f"Notion API错误 {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+# 请求Notion可能出现的错误：API错误状态码、网络错误和超时
+REQUEST_ERRORS = (NotionAPIError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def get_session():
+    """获取进程内共享的aiohttp会话，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=REQUEST_TIMEOUT,
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+    return _session
+
+
+async def close():
+    """关闭共享会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def build_headers(notion_api_key, notion_version=NOTION_VERSION):
+    return {
+        "Authorization": notion_api_key,
+        "Notion-Version": notion_version,
+        "Content-Type": "application/json",
+    }
+
+
+def retry_delay(attempt, retry_after=None):
+    """计算重试前的等待时间，优先使用Retry-After，并加入随机抖动"""
+    if retry_after is not None:
+        try:
+            return float(retry_after) + random.uniform(0, 0.5)
+        except ValueError:
+            pass
+    return min(2 ** attempt, 30) + random.uniform(0, 1)
+
+
+def can_retry(status, idempotent):
+    """429表示请求没有被执行，总是可以重试；5xx时Notion可能已经执行了请求"""
+    if status == 429:
+        return True
+    return idempotent and status in RETRY_STATUSES
+
+
+async def request(method, path, notion_api_key, payload=None, notion_version=NOTION_VERSION, idempotent=None):
+    """
+    发送Notion API请求
+    请求前按集成密钥限流，遇到429时按Retry-After/指数退避重试
+    idempotent为None时按请求方法判断，幂等请求在5xx和网络错误时也会重试；
+    创建、修改页面只在429或连接建立失败（请求尚未发出）时重试，避免重复创建记录
+    返回 (状态码, 响应内容)，响应内容为解析后的JSON，无法解析时为原始文本
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    url = path if path.startswith("http") else f"{NOTION_API_URL}/{path.lstrip('/')}"
+    data = None
+    if payload is not None:
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+
+    limiter = rate_limiters.get(notion_api_key)
+    attempt = 0
+    while True:
+        waited = await limiter.acquire()
+        if waited > 1:
+            log(f"Notion请求排队等待 {waited:.2f} 秒", "debug")
+
+        try:
+            session = get_session()
+            async with session.request(
+                method, url, headers=build_headers(notion_api_key, notion_version), data=data
+            ) as response:
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            sent = not isinstance(e, aiohttp.ClientConnectorError)
+            if attempt >= MAX_RETRIES or (sent and not idempotent):
+                raise
+            delay = retry_delay(attempt)
+            log(f"Notion请求失败 ({e})，{delay:.1f} 秒后重试", "info")
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+
+        try:
+            body = json.loads(text) if text else {}
+        except ValueError:
+            body = text
+
+        if not can_retry(status, idempotent) or attempt >= MAX_RETRIES:
+            return status, body
+
+        delay = retry_delay(attempt, retry_after)
+        if status == 429:
+            # 整个密钥一起暂停，避免同一集成的其他请求继续撞上限
+            limiter.pause(delay)
+        log(f"Notion API返回 {status}，{delay:.1f} 秒后重试 (第 {attempt + 1} 次)", "info")
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def query_database(notion_api_key, database_id, query_data=None, notion_version=NOTION_VERSION):
+    # 查询虽然是POST，但只读数据，可以安全重试
+    return await request(
+        "POST", f"databases/{database_id}/query", notion_api_key, query_data or {}, notion_version,
+        idempotent=True
+    )
+
+
+async def iter_query_database(notion_api_key, database_id, query_data=None, notion_version=NOTION_VERSION):
+    """
+    按游标分页查询数据库，每收到一页结果就yield一批页面
+    调用方处理当前批次时，下一页已经在后台请求
+    """
+    query = dict(query_data or {})
+    query.setdefault("page_size", 100)
+    pending = asyncio.ensure_future(
+        query_database(notion_api_key, database_id, query, notion_version)
+    )
+    try:
+        while pending is not None:
+            status, result = await pending
+            pending = None
+            if status != 200:
+                raise NotionAPIError(status, result)
+
+            if result.get("has_more") and result.get("next_cursor"):
+                next_query = dict(query, start_cursor=result["next_cursor"])
+                pending = asyncio.ensure_future(
+                    query_database(notion_api_key, database_id, next_query, notion_version)
+                )
+            yield result.get("results", [])
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def get_database(notion_api_key, database_id, notion_version=NOTION_VERSION):
+    return await request("GET", f"databases/{database_id}", notion_api_key, None, notion_version)
+
+
+async def get_page(notion_api_key, page_id, notion_version=NOTION_VERSION):
+    return await request("GET", f"pages/{page_id}", notion_api_key, None, notion_version)
+
+
+async def create_page(notion_api_key, payload, notion_version=NOTION_VERSION):
+    return await request("POST", "pages", notion_api_key, payload, notion_version)
+
+
+async def update_page(notion_api_key, page_id, payload, notion_version=NOTION_VERSION):
+    return await request("PATCH", f"pages/{page_id}", notion_api_key, payload, notion_version)
+
+
+async def get_me(notion_api_key, notion_version=NOTION_VERSION):
+    return await request("GET", "users/me", notion_api_key, None, notion_version)
@@ -0,0 +1,104 @@
+import heapq
+from collections import defaultdict
+from fuzzywuzzy import fuzz
+
+# 标题模糊搜索排序
+# 标题在建索引时只规范化一次；查询时先用词索引筛出至少包含一个搜索词的标题，
+# 再用partial_ratio打分，最后用堆只取前k个，不再对所有候选排序。
+# 有本地标题索引时由FTS5筛选候选（见search.searchByTitle），词索引只用于直接从Notion读取的标题。
+
+# Discord embed最多25个字段
+TOP_K = 25
+# 候选过多时只给命中搜索词最多的前这么多个打分
+MAX_CANDIDATES = 1000
+
+
+def tokenize(text):
+    """与原搜索相同的分词：小写后按空格切分"""
+    return set(text.lower().split(" "))
+
+
+def score_text(text):
+    """打分用的文本：小写，-和/替换为空格"""
+    return text.lower().replace("-", " ").replace("/", " ")
+
+
+class TitleRanker:
+    """
+    标题排序索引
+    entries是 (标题, 结果对象) 的可迭代对象，同一标题只保留第一个
+    key从结果对象取出候选ID，用于top_k的only参数
+    """
+
+    def __init__(self, entries, key=None):
+        self.items = []
+        self.score_texts = []
+        self.tokens = defaultdict(list)
+        self.positions = {}
+        seen = set()
+        for title, item in entries:
+            if title in seen:
+                continue
+            seen.add(title)
+            position = len(self.items)
+            self.items.append(item)
+            self.score_texts.append(score_text(title))
+            if key is not None:
+                self.positions[key(item)] = position
+            for token in tokenize(title):
+                self.tokens[token].append(position)
+
+    def __len__(self):
+        return len(self.items)
+
+    def candidates(self, query, max_candidates=MAX_CANDIDATES):
+        """包含任一搜索词的标题位置，按命中词数从多到少，同数时保持原顺序"""
+        hits = defaultdict(int)
+        for token in tokenize(query):
+            for position in self.tokens.get(token, ()):
+                hits[position] += 1
+        if len(hits) > max_candidates:
+            return heapq.nsmallest(max_candidates, hits, key=lambda position: (-hits[position], position))
+        return sorted(hits)
+
+    def top_k(self, query, k=TOP_K, max_candidates=MAX_CANDIDATES, only=None):
+        """
+        返回得分最高的k个结果对象，得分相同时保持原顺序
+        only是外部筛好的候选ID（需要建索引时传入key），传入时不再查词索引
+        """
+        search = query.lower()
+        score_texts = self.score_texts
+        if only is None:
+            positions = self.candidates(query, max_candidates)
+        else:
+            positions = [self.positions[item_id] for item_id in only if item_id in self.positions]
+        scored = (
+            (fuzz.partial_ratio(search, score_texts[position]), -position)
+            for position in positions
+        )
+        return [self.items[-position] for score, position in heapq.nlargest(k, scored)]
+
+
+class RankerCache:
+    """
+    按键缓存TitleRanker，建索引比单次查询还慢，只在数据版本变化时重建
+    version可以是任何可比较的值，例如标题索引的代数；key原样传给TitleRanker
+    """
+
+    def __init__(self, key=None):
+        self._rankers = {}
+        self._key = key
+
+    def get(self, key, version, load_entries):
+        """版本没变时返回缓存的TitleRanker，否则用load_entries()返回的条目重建"""
+        cached = self._rankers.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, TitleRanker(load_entries(), self._key))
+            self._rankers[key] = cached
+        return cached[1]
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._rankers.clear()
+        else:
+            self._rankers.pop(key, None)
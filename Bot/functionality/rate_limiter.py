@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+
+class LimiterStats:
+    """限流器统计：请求数、排队等待时间和429次数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    @property
+    def avg_wait(self):
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+    每秒补充rate个令牌，最多累积capacity个；等待者按先来后到排队
+    """
+
+    def __init__(self, rate=3.0, capacity=3):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.stats = LimiterStats()
+        self._lock = None
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    async def acquire(self):
+        """获取一个令牌，返回排队等待的秒数"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self.blocked_until:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.stats.requests += 1
+        self.stats.total_wait += waited
+        self.stats.last_wait = waited
+        self.stats.max_wait = max(self.stats.max_wait, waited)
+        return waited
+
+    def pause(self, seconds):
+        """收到429时暂停整个桶，所有共享此密钥的请求一起等待"""
+        self.stats.throttled += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class RateLimiterRegistry:
+    """按Notion集成密钥分配令牌桶"""
+
+    def __init__(self, rate=3.0, capacity=3):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+
+    def get(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+            self._buckets[key] = bucket
+        return bucket
+
+    def stats(self, key):
+        bucket = self._buckets.get(key)
+        return bucket.stats if bucket else None
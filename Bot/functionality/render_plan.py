@@ -0,0 +1,280 @@
+import models
+from settings.logging_config import log
+
+# Notion属性格式化
+# 每种属性类型对应一个格式化函数，通过FORMATTERS分发，
+# 函数参数为 (属性数据, RenderContext)，返回格式化后的字符串或None
+
+
+class RenderContext:
+    """格式化属性时需要的上下文：渲染器（监控cog）、服务器ID和监控配置"""
+
+    def __init__(self, renderer, guild_id=None, settings=None):
+        self.renderer = renderer
+        self.guild_id = guild_id
+        self.settings = settings
+
+
+async def format_select(property_data, context):
+    select_data = property_data.get("select")
+    if select_data:
+        return select_data.get("name", "")
+    return None
+
+
+async def format_status(property_data, context):
+    select_data = property_data.get("status")
+    if select_data:
+        return select_data.get("name", "")
+    return None
+
+
+async def format_multi_select(property_data, context):
+    multi_select = property_data.get("multi_select", [])
+    return ", ".join([item.get("name", "") for item in multi_select])
+
+
+def format_mention(text_item, context):
+    """处理用户提及，返回映射的Discord提及或用户ID，无法处理时返回None"""
+    user_id = text_item["mention"]["user"].get("id")
+    if context.guild_id and user_id:
+        discord_mention = context.renderer.get_user_mappings(context.guild_id).get(user_id)
+        return discord_mention or f"`{user_id}`"
+    return None
+
+
+async def format_title(property_data, context):
+    formatted_texts = []
+    for text_item in property_data.get("title", []):
+        if text_item.get("type") == "mention" and text_item["mention"].get("type") == "user":
+            mention = format_mention(text_item, context)
+            if mention:
+                formatted_texts.append(mention)
+        else:
+            formatted_texts.append(text_item.get("plain_text", ""))
+    return "".join(formatted_texts) if formatted_texts else None
+
+
+async def format_rich_text(property_data, context):
+    formatted_texts = []
+    for text_item in property_data.get("rich_text", []):
+        if text_item.get("type") == "mention" and text_item["mention"].get("type") == "user":
+            mention = format_mention(text_item, context)
+            formatted_texts.append(mention if mention else text_item.get("plain_text", ""))
+        else:
+            formatted_texts.append(text_item.get("plain_text", ""))
+    return " ".join(formatted_texts) if formatted_texts else None
+
+
+async def format_date(property_data, context):
+    date_data = property_data.get("date")
+    if date_data:
+        start = date_data.get("start", "")
+        end = date_data.get("end", "")
+        if end:
+            return f"{start} 至 {end}"
+        return start
+    return None
+
+
+async def format_people(property_data, context):
+    people = property_data.get("people", [])
+    if context.guild_id:
+        return context.renderer.format_user_value(people, context.guild_id)
+    return ", ".join([person.get("name", "未知") for person in people])
+
+
+async def format_files(property_data, context):
+    files = property_data.get("files", [])
+    return ", ".join([
+        f"[{file.get('name', '文件')}]({file.get('file', {}).get('url', '')})"
+        for file in files
+    ])
+
+
+async def format_checkbox(property_data, context):
+    return "✅" if property_data.get("checkbox") else "❌"
+
+
+async def format_number(property_data, context):
+    return str(property_data.get("number", ""))
+
+
+async def format_url(property_data, context):
+    url = property_data.get("url", "")
+    return f"[链接]({url})" if url else ""
+
+
+async def format_email(property_data, context):
+    return property_data.get("email", "")
+
+
+async def format_phone_number(property_data, context):
+    return property_data.get("phone_number", "")
+
+
+async def format_formula(property_data, context):
+    formula = property_data.get("formula", {})
+    return str(formula.get("string") or formula.get("number") or
+               formula.get("boolean") or formula.get("date", ""))
+
+
+async def format_created_time(property_data, context):
+    return property_data.get("created_time", "")
+
+
+async def format_last_edited_time(property_data, context):
+    return property_data.get("last_edited_time", "")
+
+
+async def format_relation(property_data, context):
+    relation_data = property_data.get("relation", [])
+    # 获取所有关联页面的ID
+    page_ids = [item["id"] for item in relation_data]
+    if not page_ids:
+        return None
+
+    # 如果没有提供guild_id，只返回ID列表
+    if not context.guild_id:
+        return ", ".join([f"`{id}`" for id in page_ids])
+
+    # 用所属监控的Notion密钥读取关联页面
+    monitor = context.settings
+    if monitor is None:
+        monitor = context.renderer.db.query(models.NotionMonitorConfig).filter_by(
+            guild_id=context.guild_id
+        ).first()
+    if not monitor:
+        return ", ".join([f"`{id}`" for id in page_ids])
+
+    related_pages = await context.renderer.get_related_pages(monitor, page_ids)
+
+    # 格式化为标题和链接
+    if related_pages:
+        return "\n".join([
+            f"[{page['title']}]({page['url']})"
+            for page in related_pages
+        ])
+    return None
+
+
+def make_default_formatter(property_type):
+    async def format_default(property_data, context):
+        return str(property_data.get(property_type, ""))
+    return format_default
+
+
+FORMATTERS = {
+    "select": format_select,
+    "status": format_status,
+    "multi_select": format_multi_select,
+    "title": format_title,
+    "rich_text": format_rich_text,
+    "date": format_date,
+    "people": format_people,
+    "files": format_files,
+    "checkbox": format_checkbox,
+    "number": format_number,
+    "url": format_url,
+    "email": format_email,
+    "phone_number": format_phone_number,
+    "formula": format_formula,
+    "created_time": format_created_time,
+    "last_edited_time": format_last_edited_time,
+    "relation": format_relation,
+}
+
+# 可以提供embed颜色的属性类型
+COLOR_TYPES = ("select", "multi_select", "status")
+
+
+def get_formatter(property_type):
+    formatter = FORMATTERS.get(property_type)
+    if formatter is None:
+        formatter = make_default_formatter(property_type)
+        FORMATTERS[property_type] = formatter
+    return formatter
+
+
+def property_color(property_data):
+    """取出select/status/multi_select属性的颜色，没有时返回None"""
+    property_type = property_data.get("type")
+    value = property_data.get(property_type)
+    if not value:
+        return None
+    if property_type == "multi_select":
+        return value[0].get("color")
+    return value.get("color")
+
+
+def schema_of(page):
+    """页面的属性结构：(属性名, 类型) 元组"""
+    return tuple(
+        (name, prop.get("type")) for name, prop in page.get("properties", {}).items()
+    )
+
+
+class RenderPlan:
+    """
+    按监控的属性结构和显示列预先编译的渲染步骤
+    title_step和columns是绑定了格式化函数的 (属性名, 函数) ，
+    color_sources是按属性顺序排列的可提供颜色的属性名
+    """
+
+    def __init__(self, schema, display_columns, title_column=None):
+        self.schema = schema
+        types = dict(schema)
+
+        self.title_step = None
+        if title_column and title_column in types:
+            self.title_step = (title_column, get_formatter(types[title_column]))
+
+        self.columns = [
+            (column, get_formatter(types[column]))
+            for column in display_columns or []
+            if column in types
+        ]
+
+        self.color_sources = [
+            name for name, property_type in schema if property_type in COLOR_TYPES
+        ]
+
+    async def run_step(self, name, formatter, page, context):
+        """执行单个格式化步骤，出错时只跳过这一列"""
+        try:
+            return await formatter(page["properties"][name], context)
+        except Exception as e:
+            log(f"格式化属性 {name} 时出错: {e}", "info")
+            return None
+
+    async def render_title(self, page, context):
+        if not self.title_step:
+            return None
+        name, formatter = self.title_step
+        return await self.run_step(name, formatter, page, context)
+
+    async def render_columns(self, page, context):
+        """按显示列顺序返回 [(列名, 格式化后的值)]"""
+        fields = []
+        for name, formatter in self.columns:
+            fields.append((name, await self.run_step(name, formatter, page, context)))
+        return fields
+
+    def pick_color(self, page):
+        """返回第一个有颜色的select/status/multi_select属性的 (属性名, Notion颜色)"""
+        properties = page["properties"]
+        for name in self.color_sources:
+            color = property_color(properties[name])
+            if color:
+                return name, color
+        return None, None
+
+
+def get_plan(settings, page):
+    """取出监控缓存的渲染计划，属性结构变化时重新编译"""
+    schema = schema_of(page)
+    plan = getattr(settings, "render_plan", None)
+    if plan is None or plan.schema != schema:
+        plan = RenderPlan(schema, settings.display_columns, settings.title_column)
+        settings.render_plan = plan
+    return plan
@@ -0,0 +1,149 @@
+import asyncio
+import heapq
+import time
+import traceback
+from datetime import datetime, timezone
+from settings.logging_config import log, should_log
+
+
+def parse_timestamp(iso_string):
+    """把last_checked等ISO时间字符串转换为Unix时间戳，无法解析时返回None"""
+    if not iso_string:
+        return None
+    try:
+        value = datetime.fromisoformat(iso_string.replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    except ValueError:
+        return None
+
+
+class MonitorStats:
+    """单个监控的调度统计"""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_duration = 0.0
+        self.last_started = None
+
+    @property
+    def avg_lag(self):
+        return self.total_lag / self.runs if self.runs else 0.0
+
+
+class MonitorScheduler:
+    """
+    监控调度器
+    按下一次到期时间维护一个优先队列，到期的监控并发执行，
+    并发数由max_workers限制，同一个监控不会同时运行两次
+    """
+
+    def __init__(self, run_monitor, max_workers=4):
+        self.run_monitor = run_monitor
+        self.max_workers = max_workers
+        self.stats = {}
+        self._heap = []
+        self._due = {}
+        self._intervals = {}
+        self._in_flight = {}
+        self._semaphore = None
+
+    def sync(self, monitors):
+        """根据当前活动的监控配置更新队列"""
+        active_ids = set()
+        for monitor in monitors:
+            active_ids.add(monitor.id)
+            interval = max(monitor.interval or 1, 1) * 60
+            previous_interval = self._intervals.get(monitor.id)
+            self._intervals[monitor.id] = interval
+
+            if monitor.id in self._due and previous_interval == interval:
+                continue
+
+            last_checked = parse_timestamp(monitor.last_checked)
+            due = last_checked + interval if last_checked else time.time()
+            self.schedule(monitor.id, due)
+
+        # 移除已停止或删除的监控
+        for monitor_id in list(self._due):
+            if monitor_id not in active_ids:
+                del self._due[monitor_id]
+                self._intervals.pop(monitor_id, None)
+
+    def schedule(self, monitor_id, due):
+        """设置监控的下一次到期时间，旧的队列项会在弹出时被忽略"""
+        self._due[monitor_id] = due
+        heapq.heappush(self._heap, (due, monitor_id))
+
+    def dispatch(self, now=None):
+        """启动所有已到期的监控，返回启动的数量"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        now = now or time.time()
+        started = 0
+        deferred = []
+        while self._heap and self._heap[0][0] <= now:
+            due, monitor_id = heapq.heappop(self._heap)
+            if self._due.get(monitor_id) != due:
+                continue
+            if monitor_id in self._in_flight:
+                # 上一次运行尚未结束，等它结束后再重新排队
+                deferred.append((due, monitor_id))
+                continue
+            self._in_flight[monitor_id] = asyncio.ensure_future(self._run(monitor_id, due))
+            started += 1
+
+        for item in deferred:
+            heapq.heappush(self._heap, item)
+        return started
+
+    async def _run(self, monitor_id, due):
+        stats = self.stats.setdefault(monitor_id, MonitorStats())
+        try:
+            async with self._semaphore:
+                started = time.time()
+                lag = max(started - due, 0.0)
+                stats.runs += 1
+                stats.last_lag = lag
+                stats.total_lag += lag
+                stats.max_lag = max(stats.max_lag, lag)
+                stats.last_started = started
+                if lag > 60:
+                    log(f"监控 {monitor_id} 调度延迟 {lag:.1f} 秒", "info")
+
+                try:
+                    await self.run_monitor(monitor_id)
+                except Exception as e:
+                    stats.failures += 1
+                    log(f"监控 {monitor_id} 运行出错: {e}", "info")
+                    if should_log("debug"):
+                        traceback.print_exc()
+                finally:
+                    stats.last_duration = time.time() - started
+        finally:
+            self._in_flight.pop(monitor_id, None)
+            if monitor_id in self._due and self._due[monitor_id] == due:
+                self.schedule(monitor_id, time.time() + self._intervals.get(monitor_id, 60))
+
+    def is_running(self, monitor_id):
+        return monitor_id in self._in_flight
+
+    def in_flight_count(self):
+        return len(self._in_flight)
+
+    def next_due(self, monitor_id):
+        return self._due.get(monitor_id)
+
+    async def shutdown(self):
+        """取消所有正在运行的监控任务"""
+        tasks = list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,24 +1,19 @@
 from fuzzywuzzy import fuzz
 import json
-import requests
 from bs4 import BeautifulSoup
 from functionality.utils import *
+from functionality import notion_http
+from functionality import title_index
+from functionality import ranking
+from settings.logging_config import log
 
-def getTitles(headers, payload, url):
+async def getTitles(notion_api, payload, notion_db):
     # send payload to get results
-    payload = json.dumps(payload)
-    response = requests.post(url, headers=headers, data=payload)
-    data = json.loads(response.text)
+    status, data = await notion_http.query_database(notion_api, notion_db, payload)
     return data
 
-def getAllTitles(notion_db, notion_api):
+async def getAllTitles(notion_db, notion_api):
     # manage payload and see across all pages
-    url = "https://api.notion.com/v1/databases/" + notion_db + "/query"
-    headers = {
-        'Authorization': notion_api,
-        'Content-Type': 'application/json',
-        'Notion-Version': '2021-08-16'
-    }
 
     payload = {
         "filter":{
@@ -28,7 +23,7 @@ def getAllTitles(notion_db, notion_api):
             }
         }
     }
-    data = getTitles(headers, payload, url)
+    data = await getTitles(notion_api, payload, notion_db)
     objects = {}
     for row in data['results']:
         try:
@@ -48,7 +43,7 @@ def getAllTitles(notion_db, notion_api):
             },
             "start_cursor": data["next_cursor"]
         }
-        data = getTitles(headers, payload, url)
+        data = await getTitles(notion_api, payload, notion_db)
         for row in data['results']:
             try:
                 title = row["properties"]["Title"]["rich_text"][0]["text"]["content"]
@@ -59,23 +54,29 @@ def getAllTitles(notion_db, notion_api):
     return objects
 
 
-def searchByTitle(search, notion_db, notion_api):
-    print(search)
-    # first get all the data of the database
-    titles = getAllTitles(notion_db, notion_api)
-    weights = {}
+# one TitleRanker per database keyed by page id, rebuilt only when the title index changes
+rankers = ranking.RankerCache(key=lambda item: item.id)
+
+
+def rankTitles(search, titles):
+    # top results in descending order, titles maps title -> SearchData
+    return ranking.TitleRanker(titles.items()).top_k(search)
+
+
+def getRanker(notion_db):
+    def load():
+        return ((title, SearchData(page_id, title, url)) for page_id, title, url in title_index.get_all(notion_db))
+    return rankers.get(notion_db, title_index.generation(notion_db), load)
+
+
+async def searchByTitle(search, notion_db, notion_api):
+    # answer from the local title index, it is only built from Notion when cold
+    try:
+        await title_index.ensure_available(notion_api, notion_db)
+    except notion_http.REQUEST_ERRORS as e:
+        log(f"Title index unavailable, searching Notion directly: {e}", "info")
+        return rankTitles(search, await getAllTitles(notion_db, notion_api))
 
-    for title in titles:
-        title_list = title.lower().split(" ")
-        search_list = search.lower().split(" ")
-        for word in search_list:
-            if word in title_list:
-                if titles[title] not in weights:
-                    # fuzzy ratio
-                    # replacing - / from title and replacing it with a space
-                    
-                    weights[titles[title]] = fuzz.partial_ratio(search.lower(), title.lower().replace("-", " ").replace("/", " "))
-                else:
-                    break
-    # return objects in descending order in list
-    return sorted(weights, key=weights.get, reverse=True)
\ No newline at end of file
+    # the FTS5 index picks the candidates, the cached ranker only scores them
+    candidates = [page_id for page_id, _, _ in title_index.search(notion_db, search, limit=ranking.MAX_CANDIDATES)]
+    return getRanker(notion_db).top_k(search, only=candidates)
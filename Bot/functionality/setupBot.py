@@ -1,10 +1,10 @@
 import asyncio
 import discord
-import requests
 from database import SessionLocal, engine
 import models
 from functionality.security import *
 import os
+from functionality import notion_http
 
 db = SessionLocal()
 
@@ -15,17 +15,10 @@ except:
 
 async def verifyDetails(notion_api_key, ctx):
     """验证API密钥是否有效"""
-    headers = {
-        "Authorization": notion_api_key,
-        "Notion-Version": "2021-05-13",
-        "Content-Type": "application/json",
-    }
     # 尝试获取用户信息来验证API密钥
-    url = "https://api.notion.com/v1/users/me"
-    res = requests.get(url, headers=headers)
-    if res.status_code != 200:
-        res = res.json()
-        if res["code"] == "unauthorized":
+    status, res = await notion_http.get_me(notion_api_key, notion_version="2021-05-13")
+    if status != 200:
+        if isinstance(res, dict) and res.get("code") == "unauthorized":
             await ctx.send("无效的Notion API密钥")
             return False
         else:
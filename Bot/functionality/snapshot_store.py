@@ -0,0 +1,203 @@
+import base64
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import func, case
+import models
+
+# SQLite单条语句的参数数量有限，IN查询按此大小分块
+IN_CHUNK_SIZE = 500
+
+# 迁移007之前的压缩快照以base64文本保存在content中，带有这个前缀
+COMPACT_PREFIX = "z1:"
+
+# 每写入这么多个快照抽样一个计算完整JSON的大小，避免每次轮询都序列化整个页面
+RAW_SIZE_SAMPLE = 32
+
+
+def now_timestamp():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def serialize(normalized):
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def strip_property(prop):
+    return {key: value for key, value in prop.items() if key != "id"}
+
+
+def property_fingerprint(prop):
+    """属性原始值的稳定指纹，值不变指纹就不变"""
+    return hashlib.blake2b(
+        serialize(strip_property(prop)).encode("utf-8"), digest_size=8
+    ).hexdigest()
+
+
+def property_fingerprints(properties):
+    return {name: property_fingerprint(prop) for name, prop in properties.items()}
+
+
+def normalize_page(page):
+    """只保留需要比较的字段：属性值、属性指纹和链接，丢弃编辑时间、图标、封面、parent等元数据"""
+    properties = {}
+    fingerprints = {}
+    for name, prop in page.get("properties", {}).items():
+        properties[name] = strip_property(prop)
+        fingerprints[name] = property_fingerprint(prop)
+    return {
+        "url": page.get("url"),
+        "properties": properties,
+        "fingerprints": fingerprints,
+    }
+
+
+def content_hash(serialized):
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def encode_content(serialized):
+    """压缩后的字节，保存在compact_content列"""
+    return zlib.compress(serialized.encode("utf-8"), 9)
+
+
+def decode_content(content, compact_content=None):
+    """解码快照内容，兼容旧版完整JSON快照和迁移前的base64文本"""
+    if compact_content:
+        return json.loads(zlib.decompress(compact_content).decode("utf-8"))
+    if content.startswith(COMPACT_PREFIX):
+        compressed = base64.b64decode(content[len(COMPACT_PREFIX):])
+        return json.loads(zlib.decompress(compressed).decode("utf-8"))
+    return json.loads(content)
+
+
+def decode_snapshot(row):
+    return decode_content(row.content, row.compact_content)
+
+
+def build_snapshot_fields(page, raw_size=None, normalized=None):
+    """
+    生成快照的存储字段：压缩后的内容、内容哈希和原始大小
+    raw_size只在转换旧快照时传入，其余情况按内容哈希抽样计算
+    """
+    serialized = serialize(normalized or normalize_page(page))
+    digest = content_hash(serialized)
+    if raw_size is None and int(digest[:8], 16) % RAW_SIZE_SAMPLE == 0:
+        raw_size = len(json.dumps(page))
+    return {
+        "content": "",
+        "compact_content": encode_content(serialized),
+        "content_hash": digest,
+        "raw_size": raw_size,
+    }
+
+
+def page_hash(page):
+    return content_hash(serialize(normalize_page(page)))
+
+
+def load_snapshots(db, monitor_id, page_ids):
+    """
+    一次性读取一批页面的快照
+    返回 {page_id: 行}，行包含id、page_id、content、compact_content、content_hash、last_updated
+    """
+    snapshots = {}
+    page_ids = list(dict.fromkeys(page_ids))
+    Snapshot = models.NotionPageSnapshot
+    for start in range(0, len(page_ids), IN_CHUNK_SIZE):
+        chunk = page_ids[start:start + IN_CHUNK_SIZE]
+        rows = db.query(
+            Snapshot.id, Snapshot.page_id, Snapshot.content, Snapshot.compact_content,
+            Snapshot.content_hash, Snapshot.last_updated
+        ).filter(
+            Snapshot.monitor_id == monitor_id,
+            Snapshot.page_id.in_(chunk)
+        ).all()
+        for row in rows:
+            snapshots[row.page_id] = row
+    return snapshots
+
+
+def save_snapshots(db, inserts, updates):
+    """
+    批量写入快照，整批只提交一次
+    inserts: 新快照的字段字典列表
+    updates: 带id的已有快照字段字典列表
+    """
+    if not inserts and not updates:
+        return
+    try:
+        if inserts:
+            db.bulk_insert_mappings(models.NotionPageSnapshot, inserts)
+        if updates:
+            db.bulk_update_mappings(models.NotionPageSnapshot, updates)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def convert_legacy_batch(db, after_id=0, batch_size=200):
+    """
+    把id大于after_id的一批旧版完整JSON快照转换为压缩格式
+    返回 (转换数量, 本批最后一行的id)，没有剩余的旧快照时最后id为None
+    """
+    Snapshot = models.NotionPageSnapshot
+    rows = db.query(Snapshot.id, Snapshot.content).filter(
+        Snapshot.content_hash.is_(None),
+        Snapshot.id > after_id
+    ).order_by(Snapshot.id).limit(batch_size).all()
+    if not rows:
+        return 0, None
+
+    updates = []
+    for row in rows:
+        try:
+            page = decode_content(row.content)
+        except ValueError:
+            continue
+        fields = build_snapshot_fields(page, raw_size=len(row.content))
+        fields["id"] = row.id
+        updates.append(fields)
+
+    save_snapshots(db, [], updates)
+    return len(updates), rows[-1].id
+
+
+def size_report(db, monitor_ids=None):
+    """
+    统计快照存储大小
+    返回 {monitor_id: {"rows", "legacy_rows", "stored_bytes", "raw_bytes"}}
+    旧快照的原始大小就是它的长度；压缩快照只有部分记录了原始大小，其余按这些行的压缩率估算
+    """
+    Snapshot = models.NotionPageSnapshot
+    legacy = Snapshot.content_hash.is_(None)
+    stored = func.coalesce(func.length(Snapshot.compact_content), func.length(Snapshot.content))
+    query = db.query(
+        Snapshot.monitor_id,
+        func.count(Snapshot.id),
+        func.sum(case((legacy, 1), else_=0)),
+        func.sum(stored),
+        func.sum(case((legacy, stored), else_=0)),
+        func.sum(case((legacy, 0), else_=func.coalesce(Snapshot.raw_size, 0))),
+        func.sum(case((legacy, 0), (Snapshot.raw_size.is_(None), 0), else_=stored)),
+    )
+    if monitor_ids is not None:
+        query = query.filter(Snapshot.monitor_id.in_(list(monitor_ids)))
+
+    report = {}
+    for monitor_id, rows, legacy_rows, stored_bytes, legacy_bytes, sampled_raw, sampled_stored in query.group_by(Snapshot.monitor_id):
+        stored_bytes = stored_bytes or 0
+        legacy_bytes = legacy_bytes or 0
+        sampled_raw = sampled_raw or 0
+        sampled_stored = sampled_stored or 0
+        ratio = sampled_raw / sampled_stored if sampled_stored else 1
+        unsampled = stored_bytes - legacy_bytes - sampled_stored
+        report[monitor_id] = {
+            "rows": rows,
+            "legacy_rows": legacy_rows or 0,
+            "stored_bytes": stored_bytes,
+            "raw_bytes": int(legacy_bytes + sampled_raw + unsampled * ratio),
+        }
+    return report
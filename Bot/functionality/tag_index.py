@@ -0,0 +1,138 @@
+from collections import defaultdict
+from sqlalchemy import text
+from database import engine
+from functionality.snapshot_store import IN_CHUNK_SIZE
+
+# 本地标签索引
+# tag_entries保存每个页面的Tag标签，和标题索引一起写入（见title_index.upsert_pages），
+# 查询时把数据库的索引载入内存，多个标签的AND/OR直接用集合求交集/并集。
+
+TAG_PROPERTY = "Tag"
+
+
+class TagIndex:
+    """单个数据库的内存索引：标签 -> 页面ID集合，以及页面ID -> 标签集合"""
+
+    def __init__(self):
+        self.pages_by_tag = defaultdict(set)
+        self.tags_by_page = {}
+
+    def set_tags(self, page_id, tags):
+        for tag in self.tags_by_page.pop(page_id, ()):
+            pages = self.pages_by_tag.get(tag)
+            if pages is not None:
+                pages.discard(page_id)
+                if not pages:
+                    del self.pages_by_tag[tag]
+        if tags:
+            self.tags_by_page[page_id] = set(tags)
+            for tag in tags:
+                self.pages_by_tag[tag].add(page_id)
+
+    def query(self, tags, mode="and"):
+        sets = [self.pages_by_tag.get(tag, set()) for tag in tags]
+        if not sets:
+            return set()
+        if mode == "or":
+            return set().union(*sets)
+        # 从最小的集合开始求交集
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+
+_indexes = {}
+
+
+def normalize_tag(tag):
+    return tag.strip().lower()
+
+
+def tags_of(page):
+    """页面Tag属性中的标签，小写，忽略空白标签"""
+    prop = page.get("properties", {}).get(TAG_PROPERTY) or {}
+    tags = set()
+    for option in prop.get("multi_select") or []:
+        tag = normalize_tag(option.get("name", ""))
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+def load_tags(conn, database_id, page_ids):
+    """{page_id: 标签集合}，没有标签的页面不在结果中"""
+    page_ids = list(page_ids)
+    tags_by_page = defaultdict(set)
+    for start in range(0, len(page_ids), IN_CHUNK_SIZE):
+        chunk = page_ids[start:start + IN_CHUNK_SIZE]
+        params = {"database_id": database_id}
+        names = []
+        for number, page_id in enumerate(chunk):
+            params[f"page{number}"] = page_id
+            names.append(f":page{number}")
+        for page_id, tag in conn.execute(text(
+            "SELECT page_id, tag FROM tag_entries WHERE database_id = :database_id "
+            f"AND page_id IN ({', '.join(names)})"
+        ), params):
+            tags_by_page[page_id].add(tag)
+    return tags_by_page
+
+
+def write_pages(conn, database_id, pages, removed_ids=()):
+    """在调用方的事务中写入一批页面的标签，并同步已载入的内存索引，返回标签是否有变化"""
+    page_tags = {page["id"]: tags_of(page) for page in pages}
+    page_ids = list(page_tags) + list(removed_ids)
+    if not page_ids:
+        return False
+    old_tags = load_tags(conn, database_id, page_ids)
+    changed = any(old_tags.get(page_id, set()) != tags for page_id, tags in page_tags.items()) \
+        or any(page_id in old_tags for page_id in removed_ids)
+    conn.execute(text(
+        "DELETE FROM tag_entries WHERE database_id = :database_id AND page_id = :page_id"
+    ), [{"database_id": database_id, "page_id": page_id} for page_id in page_ids])
+    rows = [
+        {"database_id": database_id, "page_id": page_id, "tag": tag}
+        for page_id, tags in page_tags.items()
+        for tag in tags
+    ]
+    if rows:
+        conn.execute(text(
+            "INSERT INTO tag_entries (database_id, page_id, tag) VALUES (:database_id, :page_id, :tag)"
+        ), rows)
+
+    index = _indexes.get(database_id)
+    if index is not None:
+        for page_id, tags in page_tags.items():
+            index.set_tags(page_id, tags)
+        for page_id in removed_ids:
+            index.set_tags(page_id, ())
+    return changed
+
+
+def clear(conn, database_id):
+    conn.execute(text("DELETE FROM tag_entries WHERE database_id = :database_id"),
+                 {"database_id": database_id})
+    _indexes.pop(database_id, None)
+
+
+def get_index(database_id):
+    """取出数据库的内存索引，第一次使用时从tag_entries载入"""
+    index = _indexes.get(database_id)
+    if index is None:
+        index = TagIndex()
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT page_id, tag FROM tag_entries WHERE database_id = :database_id"
+            ), {"database_id": database_id}).fetchall()
+        tags_by_page = defaultdict(set)
+        for page_id, tag in rows:
+            tags_by_page[page_id].add(tag)
+        for page_id, tags in tags_by_page.items():
+            index.set_tags(page_id, tags)
+        _indexes[database_id] = index
+    return index
+
+
+def query(database_id, tags, mode="and"):
+    """返回同时包含所有标签（mode为or时包含任一标签）的页面ID集合"""
+    tags = [normalize_tag(tag) for tag in tags if normalize_tag(tag)]
+    return get_index(database_id).query(tags, mode)
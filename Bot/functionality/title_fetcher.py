@@ -0,0 +1,122 @@
+import asyncio
+import html
+import re
+import aiohttp
+from functionality.cache import TTLCache
+from functionality.url_index import normalize_url
+from settings.logging_config import log, config
+
+# 网页标题获取
+# 流式读取响应，读到</title>或达到字节上限就停止，不下载整个页面；
+# 结果按规范化链接缓存，同一链接的并发请求只发一次。
+
+# 连接池设置：同一站点最多4个连接
+POOL_LIMIT = 50
+POOL_LIMIT_PER_HOST = 4
+DNS_CACHE_TTL = 300
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=5, connect=3, sock_read=3)
+USER_AGENT = "Mozilla/5.0 (compatible; NotionBot/1.0)"
+
+# 最多读取的字节数，<title>一般在<head>开头
+MAX_BYTES = 256 * 1024
+CHUNK_SIZE = 8192
+
+CACHE_SETTINGS = config.get('cache', {}) or {}
+TITLE_CACHE_SIZE = int(CACHE_SETTINGS.get('title_max_entries', 2000))
+TITLE_CACHE_TTL = int(CACHE_SETTINGS.get('title_ttl_seconds', 3600))
+# 获取失败的链接缓存时间较短，稍后可以重试
+FAILURE_TTL = 60
+
+TITLE_PATTERN = re.compile(rb"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+TITLE_END = re.compile(rb"</title\s*>", re.IGNORECASE)
+CHARSET_PATTERN = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.IGNORECASE)
+
+title_cache = TTLCache(TITLE_CACHE_SIZE, TITLE_CACHE_TTL)
+_session = None
+_in_flight = {}
+_MISSING = object()
+
+
+def get_session():
+    """获取标题请求共用的aiohttp会话，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=REQUEST_TIMEOUT,
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+        )
+    return _session
+
+
+async def close():
+    """关闭共享会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def parse_title(data, charset=None):
+    """从已读取的HTML开头取出标题，没有时返回None"""
+    match = TITLE_PATTERN.search(data)
+    if not match:
+        return None
+    if not charset:
+        meta = CHARSET_PATTERN.search(data)
+        charset = meta.group(1).decode("ascii", "ignore") if meta else "utf-8"
+    try:
+        title = match.group(1).decode(charset, errors="replace")
+    except LookupError:
+        title = match.group(1).decode("utf-8", errors="replace")
+    title = " ".join(html.unescape(title).split())
+    return title or None
+
+
+async def fetch_title(url):
+    """流式读取页面直到</title>或MAX_BYTES，非HTML页面返回None"""
+    async with get_session().get(url, allow_redirects=True) as response:
+        if response.status != 200:
+            return None
+        if "html" not in response.headers.get("Content-Type", "html").lower():
+            return None
+        data = b""
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            # 只在新读到的部分附近查找结束标签
+            search_from = max(0, len(data) - 16)
+            data += chunk
+            if TITLE_END.search(data, search_from) or len(data) >= MAX_BYTES:
+                break
+        return parse_title(data[:MAX_BYTES], response.charset)
+
+
+async def get_title(url):
+    """获取网页标题，失败时返回None；结果按规范化链接缓存"""
+    key = normalize_url(url)
+    title = title_cache.get(key, _MISSING)
+    if title is not _MISSING:
+        return title
+
+    pending = _in_flight.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(fetch_title(url))
+        _in_flight[key] = pending
+        try:
+            title = await pending
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, ValueError) as e:
+            log(f"获取标题失败 {url}: {e}", "debug")
+            title = None
+        finally:
+            _in_flight.pop(key, None)
+        title_cache.set(key, title, None if title else FAILURE_TTL)
+        return title
+
+    try:
+        return await asyncio.shield(pending)
+    except Exception:
+        return None
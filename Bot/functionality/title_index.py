@@ -0,0 +1,356 @@
+import asyncio
+import time
+from sqlalchemy import text
+from database import engine
+from functionality import notion_http
+from functionality import tag_index
+from functionality import url_index
+from functionality.snapshot_store import IN_CHUNK_SIZE
+from settings.logging_config import log, config
+
+# 本地标题索引
+# title_entries保存每个数据库的页面标题和链接，title_fts是它的FTS5全文索引（由迁移创建）。
+# 索引由监控快照和按last_edited_time的增量刷新维护，搜索直接查本地，
+# 只有数据库还没建过索引时才会完整读取一次Notion。
+
+INDEX_SETTINGS = config.get('title_index', {}) or {}
+REFRESH_SECONDS = int(INDEX_SETTINGS.get('refresh_seconds', 60))
+REBUILD_SECONDS = int(INDEX_SETTINGS.get('rebuild_hours', 24)) * 3600
+SEARCH_LIMIT = 200
+
+# 旧版命令使用的Notion接口版本
+INDEX_NOTION_VERSION = "2021-05-13"
+
+_tokenizer = None
+# 每个数据库一个锁，同一时间只有一个重建或刷新
+_locks = {}
+# 后台刷新任务，每个数据库最多一个
+_background = {}
+# 每个数据库索引的代数，内容变化时加一，用于判断内存中的排序索引是否过期
+_generations = {}
+
+
+def get_tokenizer(conn):
+    """title_fts使用的分词器：trigram或unicode61"""
+    global _tokenizer
+    if _tokenizer is None:
+        sql = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE name = 'title_fts'"
+        )).scalar() or ""
+        _tokenizer = "trigram" if "trigram" in sql else "unicode61"
+    return _tokenizer
+
+
+def plain_text(items):
+    return "".join(item.get("plain_text") or item.get("text", {}).get("content", "") for item in items or [])
+
+
+def extract_entry(page):
+    """
+    从页面取出 (标题, 链接)
+    优先使用旧版数据库的Title/URL列，否则使用页面的title属性和页面链接
+    """
+    properties = page.get("properties", {})
+    title_property = properties.get("Title")
+    if title_property and title_property.get("type") in ("rich_text", "title"):
+        title = plain_text(title_property.get(title_property["type"]))
+    else:
+        title = ""
+        for prop in properties.values():
+            if prop.get("type") == "title":
+                title = plain_text(prop.get("title"))
+                break
+    url_property = properties.get("URL")
+    url = url_property.get("url") if url_property else None
+    return title.strip(), url or page.get("url")
+
+
+def compact_page(page):
+    """只保留索引用到的字段，重建时整个数据库的页面要先暂存在内存中"""
+    properties = {
+        name: prop for name, prop in page.get("properties", {}).items()
+        if name in ("Title", "URL", tag_index.TAG_PROPERTY) or prop.get("type") == "title"
+    }
+    return {
+        "id": page["id"],
+        "url": page.get("url"),
+        "archived": page.get("archived"),
+        "last_edited_time": page.get("last_edited_time"),
+        "properties": properties,
+    }
+
+
+def upsert_pages(database_id, pages):
+    """写入一批页面，标题为空或已归档的页面从索引中删除"""
+    with engine.begin() as conn:
+        return write_pages(conn, database_id, pages)
+
+
+def load_entries(conn, database_id, page_ids):
+    """已索引页面的 {page_id: (标题, 链接, last_edited)}"""
+    page_ids = list(page_ids)
+    entries = {}
+    for start in range(0, len(page_ids), IN_CHUNK_SIZE):
+        chunk = page_ids[start:start + IN_CHUNK_SIZE]
+        params = {"database_id": database_id}
+        names = []
+        for number, page_id in enumerate(chunk):
+            params[f"page{number}"] = page_id
+            names.append(f":page{number}")
+        for page_id, title, url, last_edited in conn.execute(text(
+            "SELECT page_id, title, url, last_edited FROM title_entries WHERE database_id = :database_id "
+            f"AND page_id IN ({', '.join(names)})"
+        ), params):
+            entries[page_id] = (title, url, last_edited)
+    return entries
+
+
+def write_pages(conn, database_id, pages):
+    """
+    在调用方的事务中写入一批页面的标题、标签和链接，返回写入的标题数
+    last_edited_time和标题、链接都没变的页面直接跳过；标题、链接或标签真正变化时索引代数才加一
+    """
+    existing = load_entries(conn, database_id, [page["id"] for page in pages])
+    changed = False
+    rows = []
+    removed = []
+    indexed = []
+    for page in pages:
+        title, url = extract_entry(page)
+        old = existing.get(page["id"])
+        if not title or page.get("archived"):
+            removed.append({"database_id": database_id, "page_id": page["id"]})
+            changed = changed or old is not None
+            continue
+        if old is not None and old[2] == page.get("last_edited_time") and old[:2] == (title, url):
+            continue
+        changed = changed or old is None or old[:2] != (title, url)
+        indexed.append(page)
+        rows.append({
+            "database_id": database_id,
+            "page_id": page["id"],
+            "title": title,
+            "url": url,
+            "last_edited": page.get("last_edited_time"),
+        })
+    if rows:
+        conn.execute(text(
+            "INSERT INTO title_entries (database_id, page_id, title, url, last_edited) "
+            "VALUES (:database_id, :page_id, :title, :url, :last_edited) "
+            "ON CONFLICT (database_id, page_id) DO UPDATE SET "
+            "title = excluded.title, url = excluded.url, last_edited = excluded.last_edited"
+        ), rows)
+    if removed:
+        conn.execute(text(
+            "DELETE FROM title_entries WHERE database_id = :database_id AND page_id = :page_id"
+        ), removed)
+    removed_ids = [row["page_id"] for row in removed]
+    if tag_index.write_pages(conn, database_id, indexed, removed_ids):
+        changed = True
+    url_index.write_pages(conn, database_id, indexed, removed_ids)
+    if changed:
+        bump_generation(database_id)
+    return len(rows)
+
+
+def bump_generation(database_id):
+    _generations[database_id] = _generations.get(database_id, 0) + 1
+
+
+def generation(database_id):
+    return _generations.get(database_id, 0)
+
+
+def get_state(database_id):
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT watermark, refreshed_at, rebuilt_at FROM title_index_state WHERE database_id = :database_id"
+        ), {"database_id": database_id}).fetchone()
+    return row
+
+
+def save_state(conn, database_id, watermark, rebuilt=False):
+    now = int(time.time())
+    conn.execute(text(
+        "INSERT INTO title_index_state (database_id, watermark, refreshed_at, rebuilt_at) "
+        "VALUES (:database_id, :watermark, :now, :now) "
+        "ON CONFLICT (database_id) DO UPDATE SET "
+        "watermark = MAX(COALESCE(title_index_state.watermark, ''), COALESCE(excluded.watermark, '')), "
+        "refreshed_at = excluded.refreshed_at"
+        + (", rebuilt_at = excluded.rebuilt_at" if rebuilt else "")
+    ), {"database_id": database_id, "watermark": watermark, "now": now})
+
+
+def latest_edit(pages, watermark=None):
+    edits = [page.get("last_edited_time") or "" for page in pages]
+    return max(edits + [watermark or ""]) or None
+
+
+def get_lock(database_id):
+    lock = _locks.get(database_id)
+    if lock is None:
+        lock = _locks[database_id] = asyncio.Lock()
+    return lock
+
+
+async def rebuild(notion_api_key, database_id):
+    """
+    完整读取数据库重建索引
+    先读完所有页面，再在一个事务中替换旧索引，读取过程中搜索仍使用旧索引，读取失败时旧索引不变
+    """
+    start = time.monotonic()
+    watermark = None
+    staged = []
+    async for pages in notion_http.iter_query_database(
+        notion_api_key, database_id, None, INDEX_NOTION_VERSION
+    ):
+        staged.extend(compact_page(page) for page in pages)
+        watermark = latest_edit(pages, watermark)
+    # 替换过程中没有await，其他协程看不到一半的索引
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM title_entries WHERE database_id = :database_id"),
+                     {"database_id": database_id})
+        tag_index.clear(conn, database_id)
+        url_index.clear(conn, database_id)
+        bump_generation(database_id)
+        total = write_pages(conn, database_id, staged)
+        save_state(conn, database_id, watermark, rebuilt=True)
+    log(f"数据库 {database_id} 的标题索引已重建: {total} 条，用时 {time.monotonic() - start:.1f}s", "info")
+
+
+async def refresh(notion_api_key, database_id, watermark):
+    """按last_edited_time倒序读取，读到比水位线更早的页面就停止"""
+    sorts = {"sorts": [{"timestamp": "last_edited_time", "direction": "descending"}]}
+    new_watermark = watermark
+    pages_iter = notion_http.iter_query_database(
+        notion_api_key, database_id, sorts, INDEX_NOTION_VERSION
+    )
+    try:
+        async for pages in pages_iter:
+            fresh = [page for page in pages if (page.get("last_edited_time") or "") >= (watermark or "")]
+            upsert_pages(database_id, fresh)
+            new_watermark = latest_edit(fresh, new_watermark)
+            if len(fresh) < len(pages):
+                break
+    finally:
+        await pages_iter.aclose()
+    with engine.begin() as conn:
+        save_state(conn, database_id, new_watermark)
+
+
+async def ensure_fresh(notion_api_key, database_id):
+    """
+    需要最新索引时调用（如批量添加前的去重）：没有索引或超过重建周期时完整重建，否则按刷新间隔做增量刷新
+    已有索引时重建或刷新失败继续使用现有索引，还没有索引时抛出notion_http.REQUEST_ERRORS中的错误
+    """
+    async with get_lock(database_id):
+        # 在锁内读取状态，等锁的请求不会再重复刚完成的重建
+        state = get_state(database_id)
+        now = time.time()
+        try:
+            if state is None or not state.rebuilt_at or now - state.rebuilt_at > REBUILD_SECONDS:
+                await rebuild(notion_api_key, database_id)
+            elif now - (state.refreshed_at or 0) > REFRESH_SECONDS:
+                await refresh(notion_api_key, database_id, state.watermark)
+        except notion_http.REQUEST_ERRORS as e:
+            if state is None or not state.rebuilt_at:
+                raise
+            log(f"更新标题索引失败，使用现有索引: {e}", "info")
+
+
+def has_index(database_id):
+    """数据库是否已经完整建过索引"""
+    state = get_state(database_id)
+    return state is not None and bool(state.rebuilt_at)
+
+
+async def refresh_quietly(notion_api_key, database_id):
+    try:
+        await ensure_fresh(notion_api_key, database_id)
+    except notion_http.REQUEST_ERRORS as e:
+        log(f"后台建立标题索引失败: {e}", "info")
+    except Exception as e:
+        log(f"后台更新标题索引出错: {e}", "info")
+
+
+def refresh_in_background(notion_api_key, database_id):
+    """在后台执行ensure_fresh，不等待结果，同一数据库已有后台任务时不重复启动"""
+    task = _background.get(database_id)
+    if task is None or task.done():
+        _background[database_id] = asyncio.ensure_future(refresh_quietly(notion_api_key, database_id))
+
+
+async def ensure_available(notion_api_key, database_id):
+    """
+    搜索前调用：已有索引时直接返回，刷新和定期重建在后台进行；
+    只有还没有索引时才等待完整建立，失败时抛出notion_http.REQUEST_ERRORS中的错误
+    """
+    if has_index(database_id):
+        refresh_in_background(notion_api_key, database_id)
+        return
+    await ensure_fresh(notion_api_key, database_id)
+
+
+def get_entries(database_id, page_ids):
+    """按页面ID取出 (page_id, 标题, 链接)，按标题排序"""
+    page_ids = list(page_ids)
+    rows = []
+    with engine.connect() as conn:
+        for start in range(0, len(page_ids), IN_CHUNK_SIZE):
+            chunk = page_ids[start:start + IN_CHUNK_SIZE]
+            params = {"database_id": database_id}
+            names = []
+            for number, page_id in enumerate(chunk):
+                params[f"page{number}"] = page_id
+                names.append(f":page{number}")
+            rows.extend(conn.execute(text(
+                "SELECT page_id, title, url FROM title_entries WHERE database_id = :database_id "
+                f"AND page_id IN ({', '.join(names)})"
+            ), params).fetchall())
+    return sorted((tuple(row) for row in rows), key=lambda row: row[1].lower())
+
+
+def get_all(database_id):
+    """数据库所有的 (page_id, 标题, 链接)，按写入顺序"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT page_id, title, url FROM title_entries WHERE database_id = :database_id ORDER BY id"
+        ), {"database_id": database_id}).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def match_expression(query, tokenizer):
+    """把搜索词转换为FTS5查询，trigram分词下少于3个字符的词无法匹配"""
+    words = [word.replace('"', '""') for word in query.split() if word]
+    if tokenizer == "trigram":
+        words = [f'"{word}"' for word in words if len(word) >= 3]
+    else:
+        words = [f'"{word}"*' for word in words]
+    return " OR ".join(words) or None
+
+
+def search(database_id, query, limit=SEARCH_LIMIT):
+    """返回标题包含任一搜索词的 (page_id, 标题, 链接)，按FTS相关度排序"""
+    with engine.connect() as conn:
+        expression = match_expression(query, get_tokenizer(conn))
+        if expression:
+            rows = conn.execute(text(
+                "SELECT e.page_id, e.title, e.url FROM title_fts "
+                "JOIN title_entries e ON e.id = title_fts.rowid "
+                "WHERE title_fts MATCH :expression AND e.database_id = :database_id "
+                "ORDER BY title_fts.rank LIMIT :limit"
+            ), {"expression": expression, "database_id": database_id, "limit": limit}).fetchall()
+        else:
+            # 搜索词都太短，退回到LIKE查询
+            conditions = []
+            params = {"database_id": database_id, "limit": limit}
+            for number, word in enumerate(query.split()):
+                conditions.append(f"title LIKE :word{number}")
+                params[f"word{number}"] = f"%{word}%"
+            if not conditions:
+                return []
+            rows = conn.execute(text(
+                "SELECT page_id, title, url FROM title_entries WHERE database_id = :database_id "
+                f"AND ({' OR '.join(conditions)}) LIMIT :limit"
+            ), params).fetchall()
+    return [tuple(row) for row in rows]
@@ -0,0 +1,200 @@
+import hashlib
+import math
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlalchemy import text
+from database import engine
+from functionality.snapshot_store import IN_CHUNK_SIZE
+from settings.logging_config import log, config
+
+# 本地链接索引，用于添加记录时的重复检查
+# url_entries保存每个数据库中规范化后的链接，和标题索引一起写入（见title_index.upsert_pages）。
+# 默认把每个数据库的链接集合载入内存；开启bloom_filter后内存里只保存布隆过滤器，
+# 过滤器判断可能存在时再查一次数据库确认。
+
+URL_SETTINGS = config.get('url_index', {}) or {}
+USE_BLOOM_FILTER = bool(URL_SETTINGS.get('bloom_filter', False))
+BLOOM_CAPACITY = int(URL_SETTINGS.get('expected_urls', 100000))
+BLOOM_ERROR_RATE = float(URL_SETTINGS.get('false_positive_rate', 0.01))
+
+# 会被去掉的跟踪参数
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "si"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """
+    重复检查用的链接键：忽略http/https、主机名大小写、默认端口、路径末尾的/、
+    utm_*等跟踪参数和查询参数顺序
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "http://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit(("", host, path, query, parts.fragment)).lstrip("/")
+
+
+class BloomFilter:
+    """按预计数量和误判率分配位数组的布隆过滤器"""
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + number * second) % self.size for number in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+_indexes = {}
+
+
+def exists_in_db(database_id, key):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT 1 FROM url_entries WHERE database_id = :database_id AND url_key = :url_key"
+        ), {"database_id": database_id, "url_key": key}).first() is not None
+
+
+def load(database_id):
+    """把数据库的链接载入内存（集合或布隆过滤器）"""
+    with engine.connect() as conn:
+        keys = [row[0] for row in conn.execute(text(
+            "SELECT url_key FROM url_entries WHERE database_id = :database_id"
+        ), {"database_id": database_id})]
+    if USE_BLOOM_FILTER:
+        index = BloomFilter(max(BLOOM_CAPACITY, len(keys) * 2))
+        for key in keys:
+            index.add(key)
+    else:
+        index = set(keys)
+    _indexes[database_id] = index
+    return index
+
+
+def warm(database_ids):
+    """启动时预先载入各数据库的链接"""
+    for database_id in set(database_ids):
+        try:
+            load(database_id)
+        except Exception as e:
+            log(f"载入数据库 {database_id} 的链接索引失败: {e}", "info")
+
+
+def get_index(database_id):
+    index = _indexes.get(database_id)
+    return index if index is not None else load(database_id)
+
+
+def contains(database_id, url):
+    key = normalize_url(url)
+    if not key:
+        return False
+    index = get_index(database_id)
+    if key not in index:
+        return False
+    # 布隆过滤器可能误判，需要到数据库确认
+    return not USE_BLOOM_FILTER or exists_in_db(database_id, key)
+
+
+def remember(database_id, keys):
+    index = _indexes.get(database_id)
+    if index is not None:
+        for key in keys:
+            index.add(key)
+
+
+def forget(database_id, keys):
+    # 布隆过滤器无法删除，已删除的链接由数据库确认时排除
+    index = _indexes.get(database_id)
+    if isinstance(index, set):
+        index.difference_update(keys)
+
+
+def add(database_id, url, page_id=None):
+    """记录新添加的链接，不用等下一次刷新"""
+    key = normalize_url(url)
+    if not key:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO url_entries (database_id, url_key, page_id) VALUES (:database_id, :url_key, :page_id) "
+            "ON CONFLICT (database_id, url_key) DO UPDATE SET page_id = COALESCE(excluded.page_id, url_entries.page_id)"
+        ), {"database_id": database_id, "url_key": key, "page_id": page_id})
+    remember(database_id, [key])
+
+
+def remove(database_id, url):
+    key = normalize_url(url)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM url_entries WHERE database_id = :database_id AND url_key = :url_key"
+        ), {"database_id": database_id, "url_key": key})
+    forget(database_id, [key])
+
+
+def page_url(page):
+    prop = page.get("properties", {}).get("URL") or {}
+    return prop.get("url")
+
+
+def write_pages(conn, database_id, pages, removed_ids=()):
+    """在调用方的事务中写入一批页面的链接，链接改变或页面被删除时移除旧链接"""
+    page_ids = [page["id"] for page in pages] + list(removed_ids)
+    old_keys = set()
+    for start in range(0, len(page_ids), IN_CHUNK_SIZE):
+        chunk = page_ids[start:start + IN_CHUNK_SIZE]
+        params = {"database_id": database_id}
+        names = []
+        for number, page_id in enumerate(chunk):
+            params[f"page{number}"] = page_id
+            names.append(f":page{number}")
+        old_keys.update(row[0] for row in conn.execute(text(
+            "SELECT url_key FROM url_entries WHERE database_id = :database_id "
+            f"AND page_id IN ({', '.join(names)})"
+        ), params))
+    if page_ids:
+        conn.execute(text(
+            "DELETE FROM url_entries WHERE database_id = :database_id AND page_id = :page_id"
+        ), [{"database_id": database_id, "page_id": page_id} for page_id in page_ids])
+
+    rows = {}
+    for page in pages:
+        key = normalize_url(page_url(page))
+        if key:
+            rows[key] = {"database_id": database_id, "url_key": key, "page_id": page["id"]}
+    if rows:
+        conn.execute(text(
+            "INSERT INTO url_entries (database_id, url_key, page_id) VALUES (:database_id, :url_key, :page_id) "
+            "ON CONFLICT (database_id, url_key) DO UPDATE SET page_id = excluded.page_id"
+        ), list(rows.values()))
+
+    forget(database_id, old_keys - set(rows))
+    remember(database_id, rows)
+
+
+def clear(conn, database_id):
+    conn.execute(text("DELETE FROM url_entries WHERE database_id = :database_id"),
+                 {"database_id": database_id})
+    _indexes.pop(database_id, None)
@@ -1,11 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
 from database import SessionLocal, engine
 import models
 import json
 import validators
 from functionality.security import *
 import aiohttp
+from functionality import notion_http
+from functionality import title_index
+from functionality import tag_index
+from functionality import url_index
+from functionality import title_fetcher
+from settings.logging_config import log
 db = SessionLocal()
 
 
@@ -20,14 +24,9 @@ class SearchData:
         self.url = url
 
 
-def getTitle(url):
-    try:
-        request = requests.get(url)
-        soup = BeautifulSoup(request.text, "html.parser")
-        title_tag = soup.find("title")
-        return title_tag.get_text()
-    except:
-        return None
+async def getTitle(url):
+    # streamed and cached, returns None when the title can't be extracted
+    return await title_fetcher.get_title(url)
 
 
 def checkURL(url):
@@ -88,55 +87,51 @@ def getSearchTagsPayload(tags):
                 )
     return final_tag
 
-def getResults(url, payload, headers):
-    response = requests.post(url, headers=headers, data=payload)
-    results = response.json()
+async def getResults(notion_db_id, payload, notion_api_key):
+    status, results = await notion_http.query_database(
+        notion_api_key, notion_db_id, payload, notion_version="2021-05-13"
+    )
     return results
 
-def searchTag(notion_db_id, notion_api_key, tags):
-    # Search for a tag
-    url = "https://api.notion.com/v1/databases/" + notion_db_id + "/query"
-    payload = json.dumps({"filter": {"and": tags}})
-    headers = {
-        "Authorization": notion_api_key,
-        "Notion-Version": "2021-05-13",
-        "Content-Type": "application/json",
-    }
+def tagNames(tags):
+    # tag names from the multi_select filters built by getSearchTagsPayload
+    return [tag["multi_select"]["contains"] for tag in tags]
 
-    data = getResults(url, payload, headers)
-    query_results = data["results"]
-    no_of_results = len(query_results)
 
+async def searchTagInNotion(notion_db_id, notion_api_key, tags, mode="and"):
+    # Search for a tag directly in Notion, used when the local index is unavailable
+    payload = {"filter": {mode: tags}}
     search_results = []
-    if no_of_results == 0:
-        # No results found
-        return search_results
-    for result in query_results:
-        # Create Search Object for each result
-        search_object = SearchData(
-            id=result["id"],
-            url=result["properties"]["URL"]["url"].strip(),
-            title=result["properties"]["Title"]["rich_text"][0]["plain_text"].strip(),
-        )
-        search_results.append(search_object)
-    
-    while data["next_cursor"]:
-        # pagination
-        payload = json.dumps({"filter": {"and": tags}, "cursor": data["next_cursor"]})
-        data = getResults(url, payload, headers)
-        query_results = data["results"]
-        no_of_results = len(query_results)
-        if no_of_results == 0:
-            return search_results
-        for result in query_results:
+
+    while True:
+        data = await getResults(notion_db_id, payload, notion_api_key)
+        for result in data.get("results", []):
             # Create Search Object for each result
             search_object = SearchData(
                 id=result["id"],
-                url=result["properties"]["URL"]["url"].strip(),
+                url=(result["properties"]["URL"]["url"] or "").strip(),
                 title=result["properties"]["Title"]["rich_text"][0]["plain_text"].strip(),
             )
             search_results.append(search_object)
-    return search_results
+        if not data.get("next_cursor"):
+            return search_results
+        # pagination
+        payload = {"filter": {mode: tags}, "start_cursor": data["next_cursor"]}
+
+
+async def searchTag(notion_db_id, notion_api_key, tags, mode="and"):
+    # Search for pages having all tags (mode="or": any tag) from the local tag index
+    try:
+        await title_index.ensure_available(notion_api_key, notion_db_id)
+    except notion_http.REQUEST_ERRORS as e:
+        log(f"Tag index unavailable, searching Notion directly: {e}", "info")
+        return await searchTagInNotion(notion_db_id, notion_api_key, tags, mode)
+
+    page_ids = tag_index.query(notion_db_id, tagNames(tags), mode)
+    return [
+        SearchData(id=page_id, title=title, url=url)
+        for page_id, title, url in title_index.get_entries(notion_db_id, page_ids)
+    ]
 
 
 def getGuildData():
@@ -224,17 +219,18 @@ def getGuildInfo():
     print(data)
     return data
 
-def doesItExist(link, api_key, db_id):
-    url = "https://api.notion.com/v1/databases/" + db_id + "/query"
-    payload = json.dumps({"filter": {"property": "URL", "url": {"equals": link}}})
-    headers = {
-        "Authorization": api_key,
-        "Notion-Version": "2021-05-13",
-        "Content-Type": "application/json",
-    }
-    response = requests.post(url, headers=headers, data=payload)
+async def doesItExist(link, api_key, db_id):
+    # duplicate check against the local url index, refreshing or building the index runs in the background
+    title_index.refresh_in_background(api_key, db_id)
+    if title_index.has_index(db_id):
+        return url_index.contains(db_id, link)
+    # no index yet (first add on this database), ask Notion directly
+    payload = {"filter": {"property": "URL", "url": {"equals": link}}}
+    status, data = await notion_http.query_database(
+        api_key, db_id, payload, notion_version="2021-05-13"
+    )
     try:
-        result = response.json()["results"]
+        result = data["results"]
     except:
         return False
     if len(result) == 0:
@@ -265,31 +261,22 @@ def getFileTags(args):
     else:
         return [{"name": "misc"}]
 
-def queryNotion(notion_api_key, database_id, query_data):
+async def queryNotion(notion_api_key, database_id, query_data):
     """
     查询 Notion 数据库
     """
-    url = f"https://api.notion.com/v1/databases/{database_id}/query"
-    headers = {
-        'Authorization': notion_api_key,
-        'Notion-Version': '2021-08-16',
-        'Content-Type': 'application/json'
-    }
-    
     try:
         print(f"正在查询Notion数据库: {database_id}")
         print(f"查询条件: {json.dumps(query_data, indent=2)}")
         
-        payload = json.dumps(query_data)
-        response = requests.post(url, headers=headers, data=payload)
+        status, result = await notion_http.query_database(notion_api_key, database_id, query_data)
         
-        print(f"Notion API响应状态码: {response.status_code}")
-        if response.status_code == 200:
-            result = response.json()
+        print(f"Notion API响应状态码: {status}")
+        if status == 200:
             print(f"找到 {len(result.get('results', []))} 条更新")
             return result
         else:
-            print(f"Notion API错误响应: {response.text}")
+            print(f"Notion API错误响应: {result}")
             return {"results": []}
     except Exception as e:
         print(f"查询 Notion 时出错: {e}")
@@ -0,0 +1,75 @@
+import json
+from functionality.scheduler import parse_timestamp
+
+# 监控的last_edited_time水位线
+# watermark_time是已处理页面中最大的last_edited_time，watermark_page_ids是恰好在这个时间编辑的页面。
+# 查询使用 on_or_after watermark_time，重新读到的同一时间的页面在本地去重。
+# Notion的last_edited_time只精确到分钟，同一分钟内的后续编辑时间戳不变，
+# 所以只有在该分钟结束后开始的检查确认过的页面才能按ID跳过，其余交给快照的内容哈希去重。
+
+# 检查开始时间超过水位线这么多秒后，水位线那一分钟的页面才算完整
+SEAL_SECONDS = 120
+
+
+class Watermark:
+    """单次检查中使用和推进的水位线"""
+
+    def __init__(self, time=None, page_ids=(), sealed=False):
+        self.time = time
+        self.page_ids = set(page_ids)
+        self.sealed = sealed
+
+    @classmethod
+    def from_monitor(cls, monitor):
+        """从监控配置读取水位线，没有水位线时使用last_checked"""
+        try:
+            page_ids = json.loads(monitor.watermark_page_ids or "[]")
+        except ValueError:
+            page_ids = []
+        time = monitor.watermark_time or monitor.last_checked
+        # 上一次检查（last_checked是它的开始时间）在水位线那一分钟结束后才开始
+        watermark = parse_timestamp(monitor.watermark_time)
+        last_checked = parse_timestamp(monitor.last_checked)
+        sealed = bool(watermark and last_checked and last_checked - watermark >= SEAL_SECONDS)
+        return cls(time, page_ids, sealed)
+
+    def query_filter(self):
+        if not self.time:
+            return None
+        return {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {"on_or_after": self.time}
+        }
+
+    def is_seen(self, page):
+        """页面是否在上次检查中已经处理过"""
+        return (
+            self.sealed
+            and page["id"] in self.page_ids
+            and parse_timestamp(page.get("last_edited_time")) == parse_timestamp(self.time)
+        )
+
+    def advance(self, pages):
+        """用一批已处理的页面推进水位线"""
+        current = parse_timestamp(self.time)
+        for page in pages:
+            edited = page.get("last_edited_time")
+            value = parse_timestamp(edited)
+            if value is None:
+                continue
+            if current is None or value > current:
+                self.time = edited
+                current = value
+                self.page_ids = {page["id"]}
+                self.sealed = False
+            elif value == current:
+                self.page_ids.add(page["id"])
+
+    def save(self, monitor):
+        monitor.watermark_time = self.time
+        monitor.watermark_page_ids = json.dumps(sorted(self.page_ids))
+
+
+def reset(monitor, timestamp):
+    """启动或重新设置监控时从指定时间开始，之前的编辑不再通知"""
+    Watermark(timestamp).save(monitor)
@@ -0,0 +1,106 @@
+import re
+import aiohttp
+import discord
+from settings.logging_config import log
+
+# 机器人创建的Webhook名称，用于在频道里找回已有的Webhook
+WEBHOOK_NAME = "Notion Monitor"
+
+# 连接池设置：所有Webhook请求共用一个keep-alive连接池
+POOL_LIMIT = 20
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+_session = None
+_webhooks = {}
+# 发送时返回404的Webhook地址，需要重新创建
+_invalid = set()
+
+# Webhook地址最后一段是令牌，拿到完整地址就能往频道发消息
+WEBHOOK_TOKEN_PATTERN = re.compile(r"(/webhooks/\d+/)[\w-]+")
+
+
+def redact(text):
+    """把文本中Webhook地址的令牌替换为***，显示或记录日志前调用"""
+    if not text:
+        return text
+    return WEBHOOK_TOKEN_PATTERN.sub(r"\1***", str(text))
+
+
+def get_session():
+    """获取Webhook发送共用的aiohttp会话，首次调用时创建"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=POOL_LIMIT, keepalive_timeout=KEEPALIVE_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=REQUEST_TIMEOUT)
+        _webhooks.clear()
+    return _session
+
+
+async def close():
+    """关闭共享会话"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _webhooks.clear()
+
+
+def get_webhook(url):
+    """按地址取出Webhook对象，同一地址复用同一个对象"""
+    session = get_session()
+    webhook = _webhooks.get(url)
+    if webhook is None:
+        webhook = discord.Webhook.from_url(url, adapter=discord.AsyncWebhookAdapter(session))
+        _webhooks[url] = webhook
+    return webhook
+
+
+def mark_invalid(url):
+    _webhooks.pop(url, None)
+    _invalid.add(url)
+
+
+def is_invalid(url):
+    return url in _invalid
+
+
+async def ensure_webhook(channel):
+    """
+    返回频道里机器人可用的Webhook地址
+    优先复用已有的同名Webhook，没有时创建；缺少管理Webhook权限时返回None
+    """
+    try:
+        for webhook in await channel.webhooks():
+            if webhook.name == WEBHOOK_NAME and webhook.token and webhook.url not in _invalid:
+                return webhook.url
+        webhook = await channel.create_webhook(name=WEBHOOK_NAME, reason="Notion监控通知")
+        return webhook.url
+    except discord.Forbidden:
+        log(f"频道 {channel.id} 缺少管理Webhook权限，改用机器人发送", "info")
+        return None
+
+
+class WebhookTarget:
+    """通过Webhook发送embed，可以自定义显示名称和头像"""
+
+    def __init__(self, url, username=None, avatar_url=None):
+        self.url = url
+        self.username = username
+        self.avatar_url = avatar_url
+
+    async def send(self, embeds):
+        try:
+            return await get_webhook(self.url).send(
+                embeds=embeds,
+                username=self.username,
+                avatar_url=self.avatar_url,
+            )
+        except discord.NotFound:
+            # Webhook被删除，下次检查时重新创建
+            log(f"Webhook {redact(self.url)} 已被删除，下次检查时重新创建", "info")
+            mark_invalid(self.url)
+            raise
+
+    def __repr__(self):
+        return f"<WebhookTarget url={redact(self.url)!r} username={self.username!r}>"
@@ -1,13 +1,148 @@
-from database import SessionLocal, engine
+import base64
+from database import engine
 import models
-import os
+from sqlalchemy import text
 
-# 删除现有的数据库文件
-db_path = 'database/clients.sqlite'
-if os.path.exists(db_path):
-    os.remove(db_path)
-    print(f"Removed existing database: {db_path}")
+# 数据库版本记录在SQLite的 PRAGMA user_version 中
+# 新的结构变更在MIGRATIONS末尾追加一个函数即可，已执行过的迁移不会重复执行
 
-# 创建新的数据库和表
-models.Base.metadata.create_all(bind=engine)
-print("Created new database with updated schema")
\ No newline at end of file
+
+def column_exists(conn, table, column):
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn, table, column, definition):
+    """为已有表添加列，列已存在时跳过"""
+    if not column_exists(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+
+def migration_001_indexes(conn):
+    """快照和用户映射的查询索引"""
+    # 建唯一索引前先清理重复快照，每个页面只保留最新的一条
+    conn.execute(text(
+        "DELETE FROM notion_page_snapshots WHERE id NOT IN ("
+        "SELECT MAX(id) FROM notion_page_snapshots GROUP BY monitor_id, page_id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_snapshot_monitor_page "
+        "ON notion_page_snapshots (monitor_id, page_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_map_guild_notion_user "
+        "ON notion_discord_user_maps (guild_id, notion_user_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_map_guild_channel "
+        "ON notion_discord_user_maps (guild_id, channel_id)"
+    ))
+
+
+def migration_002_snapshot_hash(conn):
+    """快照内容哈希和原始大小列"""
+    add_column(conn, "notion_page_snapshots", "content_hash", "VARCHAR")
+    add_column(conn, "notion_page_snapshots", "raw_size", "INTEGER")
+
+
+def migration_003_batch_embeds(conn):
+    """监控的多embed合并发送设置"""
+    add_column(conn, "notion_monitors", "batch_embeds", "BOOLEAN DEFAULT 0")
+
+
+def migration_004_webhook_delivery(conn):
+    """监控的Webhook发送设置"""
+    add_column(conn, "notion_monitors", "delivery_mode", "VARCHAR DEFAULT 'bot'")
+    add_column(conn, "notion_monitors", "webhook_url", "VARCHAR")
+    add_column(conn, "notion_monitors", "webhook_name", "VARCHAR")
+    add_column(conn, "notion_monitors", "webhook_avatar", "VARCHAR")
+
+
+def migration_005_title_index(conn):
+    """标题全文索引，SQLite不支持trigram分词时改用unicode61"""
+    try:
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS title_fts USING fts5("
+            "title, content='title_entries', content_rowid='id', tokenize='trigram')"
+        ))
+    except Exception:
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS title_fts USING fts5("
+            "title, content='title_entries', content_rowid='id', tokenize='unicode61')"
+        ))
+    # 触发器让全文索引跟随title_entries的增删改
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS title_entries_ai AFTER INSERT ON title_entries BEGIN "
+        "INSERT INTO title_fts(rowid, title) VALUES (new.id, new.title); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS title_entries_ad AFTER DELETE ON title_entries BEGIN "
+        "INSERT INTO title_fts(title_fts, rowid, title) VALUES ('delete', old.id, old.title); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS title_entries_au AFTER UPDATE ON title_entries BEGIN "
+        "INSERT INTO title_fts(title_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+        "INSERT INTO title_fts(rowid, title) VALUES (new.id, new.title); END"
+    ))
+
+
+def migration_006_watermark(conn):
+    """监控的last_edited_time水位线"""
+    add_column(conn, "notion_monitors", "watermark_time", "VARCHAR")
+    add_column(conn, "notion_monitors", "watermark_page_ids", "VARCHAR DEFAULT '[]'")
+    # 已有监控从上次检查时间开始
+    conn.execute(text(
+        "UPDATE notion_monitors SET watermark_time = last_checked WHERE watermark_time IS NULL"
+    ))
+
+
+def migration_007_snapshot_blob(conn):
+    """压缩快照改为二进制列保存，不再使用base64文本"""
+    add_column(conn, "notion_page_snapshots", "compact_content", "BLOB")
+    prefix = "z1:"
+    after_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, content FROM notion_page_snapshots "
+            "WHERE id > :after_id AND content LIKE 'z1:%' ORDER BY id LIMIT 500"
+        ), {"after_id": after_id}).fetchall()
+        if not rows:
+            break
+        conn.execute(text(
+            "UPDATE notion_page_snapshots SET compact_content = :compact, content = '' WHERE id = :id"
+        ), [{"id": row[0], "compact": base64.b64decode(row[1][len(prefix):])} for row in rows])
+        after_id = rows[-1][0]
+
+
+MIGRATIONS = [
+    migration_001_indexes,
+    migration_002_snapshot_hash,
+    migration_003_batch_embeds,
+    migration_004_webhook_delivery,
+    migration_005_title_index,
+    migration_006_watermark,
+    migration_007_snapshot_blob,
+]
+
+
+def get_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def run_migrations(bind=engine):
+    """创建缺失的表并按顺序执行未执行过的迁移，不会删除已有数据"""
+    models.Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        version = get_version(conn)
+        for number, migration in enumerate(MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            print(f"执行数据库迁移 {number}: {migration.__doc__}")
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+    return len(MIGRATIONS)
+
+
+if __name__ == "__main__":
+    version = run_migrations()
+    print(f"数据库已升级到版本 {version}")
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index, LargeBinary
 from sqlalchemy.sql.sqltypes import Boolean
 from database import Base
 
@@ -21,8 +21,15 @@ class NotionMonitorConfig(Base):
     last_checked = Column(String, nullable=True)
     prefix = Column(String, default=PREFIX)
     title_column = Column(String, nullable=True)
+    batch_embeds = Column(Boolean, default=False)  # 是否把多条通知合并为多embed消息
+    delivery_mode = Column(String, default="bot")  # 通知发送方式：bot或webhook
+    webhook_url = Column(String, nullable=True)  # webhook模式下复用的频道Webhook
+    webhook_name = Column(String, nullable=True)  # Webhook消息显示的名称
+    webhook_avatar = Column(String, nullable=True)  # Webhook消息显示的头像地址
+    watermark_time = Column(String, nullable=True)  # 已处理页面中最大的last_edited_time
+    watermark_page_ids = Column(String, nullable=True)  # 恰好在watermark_time编辑的页面ID，JSON列表
 
-    def __init__(self, guild_id, channel_id, notion_api_key, database_id, interval=2, display_columns="[]", is_active=False, prefix=PREFIX, title_column=None):
+    def __init__(self, guild_id, channel_id, notion_api_key, database_id, interval=2, display_columns="[]", is_active=False, prefix=PREFIX, title_column=None, batch_embeds=False, delivery_mode="bot"):
         self.guild_id = guild_id
         self.channel_id = channel_id
         self.notion_api_key = notion_api_key
@@ -33,23 +40,43 @@ class NotionMonitorConfig(Base):
         self.last_checked = None
         self.prefix = prefix
         self.title_column = title_column
+        self.batch_embeds = batch_embeds
+        self.delivery_mode = delivery_mode
+        self.webhook_url = None
+        self.webhook_name = None
+        self.webhook_avatar = None
+        self.watermark_time = None
+        self.watermark_page_ids = "[]"
 
 class NotionPageSnapshot(Base):
     __tablename__ = 'notion_page_snapshots'
+    __table_args__ = (
+        Index('ix_snapshot_monitor_page', 'monitor_id', 'page_id', unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     monitor_id = Column(Integer, nullable=False)  # 关联到NotionMonitorConfig的id
     page_id = Column(String, nullable=False)  # Notion页面ID
-    content = Column(String, nullable=False)  # JSON格式存储页面内容
+    content = Column(String, nullable=False, default="")  # 旧版快照的完整JSON，新快照为空
+    compact_content = Column(LargeBinary, nullable=True)  # zlib压缩的规范化页面属性
     last_updated = Column(String, nullable=False)  # 最后更新时间
+    content_hash = Column(String, nullable=True)  # 规范化内容的SHA-256，旧快照为空
+    raw_size = Column(Integer, nullable=True)  # 完整页面JSON的大小，只在转换旧快照和抽样时记录，用于统计压缩效果
 
-    def __init__(self, monitor_id, page_id, content, last_updated):
+    def __init__(self, monitor_id, page_id, content, last_updated, content_hash=None, raw_size=None, compact_content=None):
         self.monitor_id = monitor_id
         self.page_id = page_id
         self.content = content
+        self.compact_content = compact_content
         self.last_updated = last_updated
+        self.content_hash = content_hash
+        self.raw_size = raw_size
 
 class NotionDiscordUserMap(Base):
     __tablename__ = 'notion_discord_user_maps'
+    __table_args__ = (
+        Index('ix_user_map_guild_notion_user', 'guild_id', 'notion_user_id'),
+        Index('ix_user_map_guild_channel', 'guild_id', 'channel_id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     guild_id = Column(Integer, nullable=False)
     channel_id = Column(Integer, nullable=False)
@@ -61,3 +88,44 @@ class NotionDiscordUserMap(Base):
         self.channel_id = channel_id
         self.notion_user_id = notion_user_id
         self.discord_mention = discord_mention
+
+class TitleIndexEntry(Base):
+    __tablename__ = 'title_entries'
+    __table_args__ = (
+        Index('ix_title_entries_database_page', 'database_id', 'page_id', unique=True),
+    )
+    id = Column(Integer, primary_key=True)  # 同时作为全文索引title_fts的rowid
+    database_id = Column(String, nullable=False)
+    page_id = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    url = Column(String, nullable=True)
+    last_edited = Column(String, nullable=True)  # 页面的last_edited_time
+
+class TitleIndexState(Base):
+    __tablename__ = 'title_index_state'
+    database_id = Column(String, primary_key=True)
+    watermark = Column(String, nullable=True)  # 已索引页面中最新的last_edited_time
+    refreshed_at = Column(Integer, nullable=True)  # 上次增量刷新的时间戳
+    rebuilt_at = Column(Integer, nullable=True)  # 上次全量重建的时间戳
+
+class TagIndexEntry(Base):
+    __tablename__ = 'tag_entries'
+    __table_args__ = (
+        Index('ix_tag_entries_database_tag', 'database_id', 'tag'),
+        Index('ix_tag_entries_database_page', 'database_id', 'page_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    database_id = Column(String, nullable=False)
+    page_id = Column(String, nullable=False)
+    tag = Column(String, nullable=False)  # 小写的标签名
+
+class UrlIndexEntry(Base):
+    __tablename__ = 'url_entries'
+    __table_args__ = (
+        Index('ix_url_entries_database_url', 'database_id', 'url_key', unique=True),
+        Index('ix_url_entries_database_page', 'database_id', 'page_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    database_id = Column(String, nullable=False)
+    url_key = Column(String, nullable=False)  # 规范化后的链接
+    page_id = Column(String, nullable=True)  # 刚添加、还没被刷新读到的记录为空
@@ -1,6 +1,12 @@
 import yaml
 import os
+import sys
+import json
 import random
+import atexit
+import queue
+import logging
+import logging.handlers
 
 # 获取配置文件路径
 config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'settings.yml')
@@ -10,31 +16,79 @@ try:
     with open(config_path, 'r', encoding='utf-8') as f:
         config = yaml.safe_load(f)
     LOG_LEVEL = config.get('logging', {}).get('level', 'info').lower()
+    LOG_FORMAT = config.get('logging', {}).get('format', 'text').lower()
 except Exception as e:
     print(f"加载配置文件失败: {e}")
     LOG_LEVEL = "info"  # 默认值
+    LOG_FORMAT = "text"
     config = {}
 
+LOG_LEVELS = {
+    "none": 0,
+    "info": 1,
+    "debug": 2
+}
+CURRENT_LEVEL = LOG_LEVELS.get(LOG_LEVEL, 1)  # 默认为info
+STDLIB_LEVELS = {
+    "info": logging.INFO,
+    "debug": logging.DEBUG
+}
+
+
+class JsonLineFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        return json.dumps({
+            "time": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+
+def _setup_logger():
+    """日志先写入内存队列，由后台线程输出，避免在事件循环里阻塞"""
+    logger = logging.getLogger("notion_bot")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonLineFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger
+
+
+logger = _setup_logger()
+
+
 def should_log(level):
     """检查是否应该记录日志"""
-    log_levels = {
-        "none": 0,
-        "info": 1,
-        "debug": 2
-    }
-    
-    current_level = log_levels.get(LOG_LEVEL, 1)  # 默认为info
-    required_level = log_levels.get(level.lower(), 1)
-    
-    return current_level >= required_level
-
-def log(message, level="info"):
-    """记录日志"""
-    if should_log(level):
-        # 添加时间戳
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] [{level.upper()}] {message}")
+    required_level = LOG_LEVELS.get(level)
+    if required_level is None:
+        required_level = LOG_LEVELS.get(level.lower(), 1)
+    return CURRENT_LEVEL >= required_level
+
+def log(message, level="info", *args):
+    """
+    记录日志
+    级别未开启时直接返回，不会计算消息内容：
+    message可以是返回字符串的函数，也可以是配合args使用的%格式字符串
+    """
+    if not should_log(level):
+        return
+    if callable(message):
+        message = message()
+    elif args:
+        message = message % args
+    logger.log(STDLIB_LEVELS.get(level.lower(), logging.INFO), message)
 
 def get_random_footer():
     """获取随机的footer文本"""
@@ -43,4 +97,4 @@ def get_random_footer():
         return random.choice(footers) if footers else None
     except Exception as e:
         log(f"获取随机footer失败: {e}", "info")
-        return None
\ No newline at end of file
+        return None
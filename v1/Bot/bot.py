@@ -7,7 +7,7 @@ from duplicateCheck import doesItExist, amIThere
 from tagGiver import giveTags, getSearchTags, giveTagsFileUpload
 from search import SearchObject, searchTag
 from delete import deleteMe
-#from uploadFiles import downloadFile
+from uploadFiles import downloadFileAsync, DuplicateUpload
 from getTitle import giveTitle
 import asyncio
 
@@ -36,20 +36,26 @@ async def add(ctx, *args):
                 if((doesItExist(url) == False) and (amIThere(url) == False)):
                     # amIThere checks if its on Gdrive and doesItexist on notion db
                     #The link doesnt exist in the database
-                    if(len(args) > 1):             
-                        #Add data
-                        if(".pdf" in url):
-                            gDrive_link = downloadFile(url)
-                            addPDF(gDrive_link, author, giveTitle(url), giveTags(args))
+                    try:
+                        if(len(args) > 1):             
+                            #Add data
+                            if(".pdf" in url):
+                                gDrive_link = await downloadFileAsync(url)
+                                addPDF(gDrive_link, author, giveTitle(url), giveTags(args))
+                            else:
+                                addData(url, author, giveTags(args))
                         else:
-                            addData(url, author, giveTags(args))
-                    else:
-                        #Tag not provided
-                        if(".pdf" in url):
-                            gDrive_link = downloadFile(url)
-                            addPDF(gDrive_link,author, giveTitle(url))
-                        else:
-                            addData(url, author)
+                            #Tag not provided
+                            if(".pdf" in url):
+                                gDrive_link = await downloadFileAsync(url)
+                                addPDF(gDrive_link,author, giveTitle(url))
+                            else:
+                                addData(url, author)
+                    except DuplicateUpload as duplicate:
+                        #Same file content was uploaded before under another url
+                        embed = discord.Embed(title="Already Added", description="This file is already uploaded {}".format(duplicate.link or ""), color=discord.Color.red())
+                        await ctx.send(embed=embed)
+                        return
 
                     #Send confirmation that data was pushed
                     embed = discord.Embed(title="Data added", description="New link added by {}".format(author), color=discord.Color.from_rgb(190, 174, 226))
@@ -185,13 +191,19 @@ async def upload(ctx, *args):
         
         title = reply.content
         print(title)
+        try:
+            gDrive_link = await downloadFileAsync(url)
+        except DuplicateUpload as duplicate:
+            embed = discord.Embed(title="Already Added", description="This file is already uploaded {}".format(duplicate.link or ""), color=discord.Color.red())
+            await ctx.send(embed=embed)
+            return
         if(len(args) > 0):
-            addPDF(downloadFile(url),author, title, giveTagsFileUpload(args,url))
+            addPDF(gDrive_link,author, title, giveTagsFileUpload(args,url))
         else:
             if(".pdf" in url):
-                addPDF(downloadFile(url),author, title)
+                addPDF(gDrive_link,author, title)
             else:
-                addGenericFile(downloadFile(url),author, title)
+                addGenericFile(gDrive_link,author, title)
         
     embed = discord.Embed(title="Data added", description="New link added by {}".format(author), color=discord.Color.from_rgb(190, 174, 226))
     await ctx.send(embed=embed)
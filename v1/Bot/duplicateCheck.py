@@ -1,6 +1,7 @@
 import requests
 import json
 import os
+import uploadLedger
 
 database = os.environ["DATABASE_TOKEN"]
 print(database)
@@ -30,11 +31,5 @@ def doesItExist(link):
   return True
 
 def amIThere(file):
-    filesUploaded = []
-    with open("./dataUploaded.txt") as log:
-        filesUploaded = [line.strip() for line in log]
-    print(filesUploaded)
-
-    if file in filesUploaded:
-        return True
-    return False
+    # indexed lookup in the upload ledger, dataUploaded.txt is imported into it
+    return uploadLedger.hasUrl(file)
@@ -1,72 +1,184 @@
 from __future__ import print_function
 import os.path
+import sys
+import asyncio
+import hashlib
+import mimetypes
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, unquote
+import requests
 from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
-from googleapiclient.http import MediaFileUpload
-import sys
-import magic
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.http import MediaIoBaseUpload, build_http
+import uploadLedger
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/drive','https://www.googleapis.com/auth/drive.file']
 
 folder_id = ""
 
-def downloadFile(url):
-    os.system(f"wget --no-check-certificate {url} -P ./data/")
-    g_link = uploadFiles(url.split("/")[-1], url)
-    return g_link
+# Optional Drive API root, e.g. http://localhost:8080/ to run against a fake Drive server
+api_endpoint = os.environ.get('GDRIVE_API_ENDPOINT')
 
-def uploadFiles(fileName, url):
-    """Shows basic usage of the Drive v3 API.
-    Prints the names and ids of the first 10 files the user has access to.
+# Number of uploads that can run at the same time
+upload_workers = int(os.environ.get('UPLOAD_WORKERS', 4))
+
+# Files up to this size stay in memory, bigger ones are spooled to a temporary file
+SPOOL_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK = 256 * 1024
+# Resumable upload chunk size, must be a multiple of 256KB
+UPLOAD_CHUNK = 4 * 1024 * 1024
+UPLOAD_RETRIES = 3
+
+executor = ThreadPoolExecutor(max_workers=upload_workers)
+# httplib2 is not thread safe, so every worker thread keeps its own Drive client
+threadState = threading.local()
+credentials = None
+
+
+class DuplicateUpload(Exception):
+    """The same content was already uploaded, link is its Drive link when known"""
+
+    def __init__(self, link):
+        super().__init__(link)
+        self.link = link
+
+
+def getCredentials():
+    """Load the Drive credentials once"""
+    global credentials
+    if credentials is None:
+        # The file token.json stores the user's access and refresh tokens, and is
+        # created automatically when the authorization flow completes for the first
+        # time.
+        if os.path.exists('./creds/token.json'):
+            credentials = Credentials.from_authorized_user_file('./creds/token.json', SCOPES)
+
+        # if this file isnt there this may be a heroku instance
+        elif os.path.exists('/app/google-credentials.json'):
+            credentials = Credentials.from_authorized_user_file('/app/google-credentials.json', SCOPES)
+
+        # a fake Drive endpoint doesn't need credentials
+        elif api_endpoint:
+            credentials = AnonymousCredentials()
+        else:
+            print("Please run upload upload.py before using it!!!")
+            sys.exit(1)
+    return credentials
+
+
+def getService():
+    """Drive client of the current thread, built on first use"""
+    service = getattr(threadState, "service", None)
+    if service is None:
+        # build_http keeps 308 responses for resumable uploads instead of following them
+        http = AuthorizedHttp(getCredentials(), http=build_http())
+        client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+        service = build('drive', 'v3', http=http, client_options=client_options,
+                        static_discovery=True, cache_discovery=False)
+        threadState.service = service
+    return service
+
+
+def rebaseUri(uri):
+    """Media upload urls keep the scheme of the real Drive api, point them at api_endpoint"""
+    if not api_endpoint:
+        return uri
+    endpoint = urlsplit(api_endpoint)
+    return urlunsplit(urlsplit(uri)._replace(scheme=endpoint.scheme, netloc=endpoint.netloc))
+
+
+def fileNameFromUrl(url):
+    return unquote(urlsplit(url).path.rstrip("/").split("/")[-1]) or "upload"
+
+
+def giveMimeType(fileName, contentType=None):
+    """MIME type from the response header, falling back to the file extension"""
+    if contentType:
+        contentType = contentType.split(";")[0].strip()
+        if contentType and contentType != "application/octet-stream":
+            return contentType
+    return mimetypes.guess_type(fileName)[0] or "application/octet-stream"
+
+
+def downloadToBuffer(url):
+    """
+    Stream the file into a per-job buffer, hashing it on the way
+    returns (buffer, content type, sha256 hex digest, size)
     """
-    creds = None
-    # The file token.json stores the user's access and refresh tokens, and is
-    # created automatically when the authorization flow completes for the first
-    # time.
-    if os.path.exists('./creds/token.json'):
-        creds = Credentials.from_authorized_user_file('./creds/token.json', SCOPES)
-    
-    # if this file isnt there this may be a heroku instance
-    elif os.path.exists('/app/google-credentials.json'):
-        creds = Credentials.from_authorized_user_file('/app/google-credentials.json', SCOPES)
-    else:
-        print("Please run upload upload.py before using it!!!")
-        sys.exit(1)
-
-    service = build('drive', 'v3', credentials=creds)
-
-    # Call the Drive v3 API
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                buffer.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            contentType = response.headers.get("Content-Type")
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer, contentType, digest.hexdigest(), size
+
+
+def uploadBuffer(buffer, fileName, mimeType):
+    """Chunked resumable upload of the buffer to the Drive folder, returns the file id"""
     file_metadata = {
         "name": fileName,
         "parents": [folder_id]
     }
-    path = "./data/{}".format(fileName)
-    media = MediaFileUpload(path, mimetype=giveMimeType(fileName))
-    file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-
-    with open("dataUploaded.txt", "a+") as log:
-        # Move read cursor to the start of file.
-        log.seek(0)
-        # If file is not empty then append '\n'
-        data = log.read(100)
-        if len(data) > 0 :
-            log.write("\n")
-        # Append text at the end of file
-        log.write(url)
-
-    link = f"https://drive.google.com/file/d/{file.get('id')}"
-    os.system("rm ./data/*")
+    media = MediaIoBaseUpload(buffer, mimetype=mimeType, chunksize=UPLOAD_CHUNK, resumable=True)
+    request = getService().files().create(body=file_metadata, media_body=media, fields='id')
+    request.uri = rebaseUri(request.uri)
+    response = None
+    while response is None:
+        status, response = request.next_chunk(num_retries=UPLOAD_RETRIES)
+    return response.get('id')
+
+
+def uploadFiles(fileName, url):
+    """
+    Download url and upload it to Drive as fileName, returns the Drive link
+    raises DuplicateUpload without touching Drive when the content is in the ledger,
+    a concurrent job with the same content is waited for and only retried here if it fails
+    """
+    buffer, contentType, sha256, size = downloadToBuffer(url)
+    try:
+        existing = uploadLedger.claim(sha256)
+        if existing is not None:
+            raise DuplicateUpload(existing or None)
+        try:
+            file_id = uploadBuffer(buffer, fileName, giveMimeType(fileName, contentType))
+        except Exception:
+            uploadLedger.release(sha256)
+            raise
+    finally:
+        buffer.close()
+    link = f"https://drive.google.com/file/d/{file_id}"
+    uploadLedger.record(sha256, url, link, size)
     return link
 
-def giveMimeType(file):
-    mime = magic.Magic(mime=True)
-    return mime.from_file(f"./data/{file}")
+
+def downloadFile(url):
+    return uploadFiles(fileNameFromUrl(url), url)
+
+
+async def downloadFileAsync(url):
+    """Run downloadFile on the upload pool without blocking the event loop"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, downloadFile, url)
+
+
 try:
     print(os.environ['GDRIVE_FOLDER'])
     folder_id = str(os.environ['GDRIVE_FOLDER'])
 
 except:
-    print("Invalid folder id")
\ No newline at end of file
+    print("Invalid folder id")
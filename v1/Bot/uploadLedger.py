@@ -0,0 +1,105 @@
+import os
+import sys
+import sqlite3
+import threading
+import time
+
+# Ledger of files uploaded to Drive, keyed by the SHA-256 of the content and by url.
+# Rows imported from the old dataUploaded.txt only have a url.
+
+LEDGER_PATH = os.environ.get('UPLOAD_LEDGER', './uploadLedger.sqlite')
+UPLOAD_LOG = './dataUploaded.txt'
+
+lock = threading.Lock()
+connection = None
+# hashes being uploaded right now -> event set when that upload is recorded or released,
+# so two concurrent jobs with the same content upload once
+pending = {}
+
+
+def getConnection():
+    global connection
+    if connection is None:
+        connection = sqlite3.connect(LEDGER_PATH, check_same_thread=False)
+        created = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'uploads'").fetchone() is None
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE, url TEXT, drive_link TEXT, "
+            "size INTEGER, uploaded_at INTEGER)")
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_uploads_url ON uploads (url)")
+        connection.commit()
+        if created and os.path.exists(UPLOAD_LOG):
+            importUploadLog(UPLOAD_LOG, connection)
+    return connection
+
+
+def importUploadLog(path=UPLOAD_LOG, conn=None):
+    """Import the urls of an old dataUploaded.txt, returns the number of new rows"""
+    conn = conn or getConnection()
+    with open(path) as log:
+        urls = set(line.strip() for line in log if line.strip())
+    known = set(row[0] for row in conn.execute("SELECT url FROM uploads WHERE url IS NOT NULL"))
+    rows = [(url, int(time.time())) for url in urls - known]
+    conn.executemany("INSERT INTO uploads (url, uploaded_at) VALUES (?, ?)", rows)
+    conn.commit()
+    return len(rows)
+
+
+def hasUrl(url):
+    with lock:
+        return getConnection().execute(
+            "SELECT 1 FROM uploads WHERE url = ?", (url,)).fetchone() is not None
+
+
+def claim(sha256):
+    """
+    Returns the drive link when this content was uploaded before, otherwise reserves the hash and returns None.
+    When another job is uploading the same content, waits for it: returns its link if it succeeds,
+    or reserves the hash for this job if it fails
+    """
+    while True:
+        with lock:
+            row = getConnection().execute(
+                "SELECT drive_link FROM uploads WHERE sha256 = ?", (sha256,)).fetchone()
+            if row:
+                return row[0] or ""
+            uploading = pending.get(sha256)
+            if uploading is None:
+                pending[sha256] = threading.Event()
+                return None
+        uploading.wait()
+
+
+def finish(sha256):
+    # called with lock held, wakes up the jobs waiting in claim
+    uploading = pending.pop(sha256, None)
+    if uploading is not None:
+        uploading.set()
+
+
+def release(sha256):
+    with lock:
+        finish(sha256)
+
+
+def record(sha256, url, drive_link, size):
+    with lock:
+        try:
+            conn = getConnection()
+            conn.execute(
+                "INSERT INTO uploads (sha256, url, drive_link, size, uploaded_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sha256) DO NOTHING",
+                (sha256, url, drive_link, size, int(time.time())))
+            conn.commit()
+        finally:
+            finish(sha256)
+
+
+if __name__ == "__main__":
+    # python uploadLedger.py import [path/to/dataUploaded.txt]
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        path = sys.argv[2] if len(sys.argv) > 2 else UPLOAD_LOG
+        print(f"Imported {importUploadLog(path)} urls from {path}")
+    else:
+        print("Usage: python uploadLedger.py import [path/to/dataUploaded.txt]")